@@ -1,27 +1,49 @@
 import streamlit as st
-import pandas as pd
+import streamlit.components.v1 as components
 import pydeck as pdk
 import os
 from dotenv import load_dotenv
-import google.generativeai as genai
 import datetime
-import numpy as np
-
-# Carregar variáveis de ambiente (onde a chave da API Gemini estará)
-load_dotenv()
-
-# Configurar a API do Google Gemini
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-if GOOGLE_API_KEY:
-    try:
-        genai.configure(api_key=GOOGLE_API_KEY)
-        model = genai.GenerativeModel('gemini-2.0-flash') # Modelo que funcionou para você
-    except Exception as e:
-        st.error(f"Erro ao configurar a API da Gemini: {e}. Verifique sua chave e acesso ao modelo 'gemini-2.0-flash'.")
-        model = None
-else:
-    st.error("Chave da API do Google Gemini não configurada. Crie um arquivo .env com GOOGLE_API_KEY='sua_chave_aqui'.")
-    model = None
+import json
+import logging
+import subprocess
+import threading
+import uuid
+
+from binary_transport import BinaryDeck
+from cities import CITIES
+from dataset_store import DatasetStore, DayFileWriter, RollingWindow, default_window
+from forecast import DEFAULT_HORIZON_HOURS, fit_nowcast, forecast_lines, forecast_peaks, history_frame
+from ingestion import ingest, open_source
+from insight_cache import InsightCache
+from insight_worker import CANCELLED, FAILED, POLL_INTERVAL_SECONDS, InsightWorker
+from insights import build_prompt, prompt_cache_key, summary_lines
+from llm_backends import GEMINI_MODEL_NAME, STUB_MODEL_NAME, StubModel, load_gemini_model
+from map_layers import build_deck
+from prewarm import run_prewarm
+from simulation import DEFAULT_SEED, day_names, type_names
+from spatial_bins import RAW_POINTS_MIN_ZOOM, level_of_detail
+from stage_timer import StageTimer
+from summary import percentile_columns, summarize_typed
+
+# Carregar variáveis de ambiente (onde a chave da API Gemini estará), uma vez por processo
+@st.cache_resource(show_spinner=False) # Antes de set_page_config: não pode desenhar nada
+def load_environment():
+    load_dotenv()
+
+load_environment()
+
+MODEL_NAME = GEMINI_MODEL_NAME # Modelo que funcionou para você
+if os.getenv("GEOPREDICTOR_LLM_BACKEND") == STUB_MODEL_NAME:
+    MODEL_NAME = STUB_MODEL_NAME # Modelo local simulado, para desenvolvimento offline
+
+# Cliente do modelo criado só no primeiro pedido de insights e compartilhado por todas as
+# sessões do processo; o SDK da Gemini só é importado aqui (llm_backends.load_gemini_model)
+@st.cache_resource
+def get_model(model_name):
+    if model_name == STUB_MODEL_NAME:
+        return StubModel(latency_seconds=1.0, chunk_delay_seconds=0.02)
+    return load_gemini_model(os.getenv("GOOGLE_API_KEY"), model_name)
 
 # --- Título e Descrição do Aplicativo ---
 st.set_page_config(layout="wide")
@@ -30,184 +52,81 @@ st.markdown("""
 Bem-vindo ao **GeoPredictor**! Esta ferramenta inovadora utiliza dados espaciais e temporais, combinados com Inteligência Artificial (Google Gemini), para analisar padrões urbanos e ambientais em **diversas cidades**. Explore o globo interativo, descubra insights preditivos e tome decisões proativas.
 """)
 
+# --- Tempos por Etapa (depuração) ---
+# Cada rerun mede suas etapas (stage_timer.py); com GEOPREDICTOR_DEBUG=1 ou ?debug=1 na URL,
+# um painel na sidebar mostra os tempos e exporta as últimas execuções em JSON
+DEBUG_PANEL = os.getenv("GEOPREDICTOR_DEBUG") == "1" or st.query_params.get("debug") == "1"
+DEBUG_HISTORY_RUNS = 20
+timer = StageTimer(track_memory=os.getenv("GEOPREDICTOR_TRACK_MEMORY") == "1")
+
 # --- Sidebar para Controles e Filtros ---
 st.sidebar.header("⚙️ Controles e Filtros")
 
-# Dicionário de cidades e suas coordenadas centrais e zoom padrão
-CITIES = {
-    "João Pessoa, PB": {"lat": -7.1197, "lon": -34.8450, "zoom": 12},
-    "Recife, PE": {"lat": -8.0476, "lon": -34.8769, "zoom": 11},
-    "Natal, RN": {"lat": -5.7950, "lon": -35.2110, "zoom": 11},
-    "São Paulo, SP": {"lat": -23.5505, "lon": -46.6333, "zoom": 10},
-    "Rio de Janeiro, RJ": {"lat": -22.9068, "lon": -43.1729, "zoom": 11},
-    "Brasília, DF": {"lat": -15.7797, "lon": -47.9297, "zoom": 10},
-    "Salvador, BA": {"lat": -12.9714, "lon": -38.5014, "zoom": 11},
-    "Curitiba, PR": {"lat": -25.4284, "lon": -49.2733, "zoom": 11},
-    "Sergipe, SE": {"lat": -10.9472, "lon": -37.0731, "zoom": 11},
-    "Lagarto, SE": {"lat": -10.9031, "lon": -37.6464, "zoom": 12},
-}
-
 selected_city_name = st.sidebar.selectbox("Selecione a Cidade", list(CITIES.keys()))
 selected_city_coords = CITIES[selected_city_name]
 center_lat = selected_city_coords["lat"]
 center_lon = selected_city_coords["lon"]
 initial_zoom = selected_city_coords.get("zoom", 10)
 
-# Mapear dia da semana para nome (para melhor legibilidade)
-day_names = ["Segunda-feira", "Terça-feira", "Quarta-feira", "Quinta-feira", "Sexta-feira", "Sábado", "Domingo"]
-
 # --- Geração de Dados Simulados Dinâmicos e Espalhados ---
-@st.cache_data
-def generate_simulated_data(city_lat, city_lon, city_name, start_date_sim, end_date_sim):
-    data_records = []
-    
-    # Funções auxiliares para gerar intensidade com base no dia/hora
-    def get_traffic_intensity(hour, day_of_week):
-        intensity = 0.2
-        if day_of_week < 5: # Dias úteis (Seg-Sex)
-            if 7 <= hour <= 9 or 17 <= hour <= 19: # Horários de pico
-                intensity = 0.9
-            elif 12 <= hour <= 14: # Almoço
-                intensity = 0.6
-        else: # Fim de semana
-            if 10 <= hour <= 18: # Maior fluxo de lazer
-                intensity = 0.4
-        return min(intensity + np.random.rand() * 0.3, 1.0) # Adiciona aleatoriedade
-
-    def get_tourist_intensity(hour, day_of_week):
-        intensity = 0.1
-        if day_of_week >= 5: # Fim de semana
-            if 9 <= hour <= 18: # Horário de maior movimento
-                intensity = 0.9
-        else: # Dias úteis
-            if 10 <= hour <= 17: # Alguns turistas
-                intensity = 0.4
-        return min(intensity + np.random.rand() * 0.3, 1.0)
-
-    def get_flood_risk_intensity(hour, day_of_week, rain_forecast_mm):
-        intensity = 0.1 # Base sem chuva
-        if rain_forecast_mm > 0:
-            if rain_forecast_mm > 30 and (6 <= hour <= 10 or 16 <= hour <= 20):
-                intensity = 0.9
-            elif rain_forecast_mm > 15:
-                intensity = 0.6
-            else:
-                intensity = 0.3
-        return min(intensity + np.random.rand() * 0.2, 1.0)
-
-    # --- LOCALIZAÇÕES BASE ESPECÍFICAS PARA JOÃO PESSOA (Em fase de testes) ---
-    # Usaremos estas coordenadas se a cidade selecionada for "João Pessoa, PB"
-    jp_traffic_locations = [
-        {"name": "Av. Epitácio Pessoa (Centro)", "lat": -7.1166, "lon": -34.8385},
-        {"name": "Av. Ruy Carneiro (Miramar)", "lat": -7.1200, "lon": -34.8450},
-        {"name": "BR-230 (Acesso Gauchinha)", "lat": -7.1350, "lon": -34.8850},
-        {"name": "Av. Beira Rio (Bancários)", "lat": -7.1000, "lon": -34.8700},
-    ]
-
-    jp_tourist_locations = [
-        {"name": "Praia de Tambaú", "lat": -7.1187, "lon": -34.8090},
-        {"name": "Praia de Cabo Branco", "lat": -7.1300, "lon": -34.7950},
-        {"name": "Farol do Cabo Branco", "lat": -7.1490, "lon": -34.7930},
-        {"name": "Parque da Lagoa (Centro)", "lat": -7.1070, "lon": -34.8800},
-    ]
-
-    jp_flood_locations = [
-        {"name": "Bessa (próximo à BR)", "lat": -7.0900, "lon": -34.8500},
-        {"name": "Bancários (área baixa)", "lat": -7.1000, "lon": -34.8700},
-        {"name": "Padre Zé (trechos)", "lat": -7.1250, "lon": -34.8600},
-    ]
-
-    # --- LOCALIZAÇÕES BASE GENÉRICAS para outras Cidades (ajustadas para melhor dispersão) ---
-    # Estes são offsets relativos ao centro da cidade selecionada
-    generic_traffic_offsets = [
-        {"name": "Av. Principal Norte", "lat_offset": 0.02, "lon_offset": 0.01}, # +- 2.2km N, 1.1km E
-        {"name": "Av. Principal Sul", "lat_offset": -0.015, "lon_offset": 0.005}, # +- 1.6km S, 0.5km E
-        {"name": "Anel Viário Leste", "lat_offset": 0.005, "lon_offset": -0.025}, # +- 0.5km N, 2.7km W
-    ]
-    generic_tourist_offsets = [
-        {"name": "Ponto Turístico Principal", "lat_offset": 0.01, "lon_offset": -0.03}, # +- 1.1km N, 3.3km W
-        {"name": "Praça Histórica Central", "lat_offset": -0.005, "lon_offset": 0.002}, # +- 0.5km S, 0.2km E
-    ]
-    generic_flood_offsets = [
-        {"name": "Área de Baixo Relevo 1", "lat_offset": 0.008, "lon_offset": -0.018}, # +- 0.8km N, 2km W
-        {"name": "Região Próxima ao Rio", "lat_offset": -0.012, "lon_offset": 0.01}, # +- 1.3km S, 1.1km E
-    ]
-
-
-    current_date_iter = start_date_sim
-    while current_date_iter <= end_date_sim:
-        day_of_week = current_date_iter.weekday()
-        rain_forecast = np.random.choice([0, 5, 15, 40], p=[0.6, 0.2, 0.15, 0.05])
-
-        for hour in range(0, 24):
-            # Escolhe os pontos base dependendo da cidade
-            if city_name == "João Pessoa, PB":
-                traffic_bases = jp_traffic_locations
-                tourist_bases = jp_tourist_locations
-                flood_bases = jp_flood_locations
-            else:
-                # Se não for JP, usa os offsets genéricos a partir do centro da cidade selecionada
-                traffic_bases = [{"name": p["name"], "lat": city_lat + p["lat_offset"], "lon": city_lon + p["lon_offset"]} for p in generic_traffic_offsets]
-                tourist_bases = [{"name": p["name"], "lat": city_lat + p["lat_offset"], "lon": city_lon + p["lon_offset"]} for p in generic_tourist_offsets]
-                flood_bases = [{"name": p["name"], "lat": city_lat + p["lat_offset"], "lon": city_lon + p["lon_offset"]} for p in generic_flood_offsets]
-
-            # Gerar pontos de tráfego
-            for loc in traffic_bases:
-                lat_jitter = (np.random.rand() - 0.5) * 0.002 # Variação muito pequena para manter perto do local base
-                lon_jitter = (np.random.rand() - 0.5) * 0.002
-                data_records.append({
-                    'lat': loc['lat'] + lat_jitter,
-                    'lon': loc['lon'] + lon_jitter,
-                    'intensity': get_traffic_intensity(hour, day_of_week) * 10,
-                    'type': 'Tráfego Intenso',
-                    'location_name': loc['name'],
-                    'area': f"Área de Tráfego",
-                    'timestamp': datetime.datetime.combine(current_date_iter, datetime.time(hour, 0)),
-                    'day_of_week': day_of_week,
-                    'rain_forecast_mm': rain_forecast
-                })
-            
-            # Gerar pontos turísticos
-            for loc in tourist_bases:
-                lat_jitter = (np.random.rand() - 0.5) * 0.001 
-                lon_jitter = (np.random.rand() - 0.5) * 0.001
-                data_records.append({
-                    'lat': loc['lat'] + lat_jitter,
-                    'lon': loc['lon'] + lon_jitter,
-                    'intensity': get_tourist_intensity(hour, day_of_week) * 10,
-                    'type': 'Concentração Turística',
-                    'location_name': loc['name'],
-                    'area': f"Área Turística",
-                    'timestamp': datetime.datetime.combine(current_date_iter, datetime.time(hour, 0)),
-                    'day_of_week': day_of_week,
-                    'rain_forecast_mm': rain_forecast
-                })
-            
-            # Gerar pontos de risco de alagamento
-            for loc in flood_bases:
-                lat_jitter = (np.random.rand() - 0.5) * 0.001 
-                lon_jitter = (np.random.rand() - 0.5) * 0.001
-                data_records.append({
-                    'lat': loc['lat'] + lat_jitter,
-                    'lon': loc['lon'] + lon_jitter,
-                    'intensity': get_flood_risk_intensity(hour, day_of_week, rain_forecast) * 10,
-                    'type': 'Risco de Alagamento',
-                    'location_name': loc['name'],
-                    'area': f"Área de Alagamento",
-                    'timestamp': datetime.datetime.combine(current_date_iter, datetime.time(hour, 0)),
-                    'day_of_week': day_of_week,
-                    'rain_forecast_mm': rain_forecast
-                })
-        current_date_iter += datetime.timedelta(days=1)
-
-    df = pd.DataFrame(data_records)
-    df['day_of_week_name'] = df['day_of_week'].map(lambda x: day_names[x])
-    return df
+# O motor vetorizado fica em simulation.py. Cada dia de cada cidade é gerado uma única vez e
+# persistido em disco (dataset_store.py, Arrow IPC); reinícios e outras réplicas do app
+# apenas mapeiam os arquivos em memória, sem regenerar nem guardar uma cópia própria.
+# A janela simulada termina hoje (ou em GEOPREDICTOR_WINDOW_END) e desliza a cada dia:
+# só o dia novo é gerado, e os dias além da retenção saem do disco.
+dataset_store = DatasetStore()
+
+# Feed real de sensores/eventos (CSV, Parquet ou JSONL; ver ingestion.py), opcional: quando
+# GEOPREDICTOR_FEED_PATH aponta para um arquivo, ele pode substituir a simulação na sidebar.
+FEED_PATH = os.getenv("GEOPREDICTOR_FEED_PATH")
+SIMULATION_SOURCE = "Simulação"
+FEED_SOURCE = "Feed de sensores"
+
+@st.cache_resource(max_entries=4)
+def load_feed_index(path, modified_at):
+    # Ingerido em blocos uma vez por versão do arquivo (modified_at entra na chave do cache).
+    # Cada flush vai para arquivos diários mapeados em memória (dataset_store.DayFileWriter),
+    # então o feed não fica inteiro em memória; as versões antigas do feed saem do disco.
+    # Limitação: qualquer mudança no arquivo reingere o arquivo inteiro, sem ler só as linhas
+    # novas; feeds que crescem sem parar devem chegar por QueueSource (ingestion.py).
+    directory = dataset_store.feed_dir(path, modified_at)
+    writer, stats = ingest(open_source(path), DayFileWriter(directory, metadata={"feed": path}))
+    dataset_store.evict_feeds(directory)
+    return writer.dataset, stats
+
+data_source = SIMULATION_SOURCE
+if FEED_PATH:
+    data_source = st.sidebar.radio("Fonte dos Dados", [SIMULATION_SOURCE, FEED_SOURCE])
+
+feed_index = None
+if data_source == FEED_SOURCE:
+    try:
+        feed_modified_at = os.path.getmtime(FEED_PATH)
+        with timer.stage("ingestão do feed") as stage:
+            feed_index, feed_stats = load_feed_index(FEED_PATH, feed_modified_at)
+            stage.rows = feed_stats.rows_ingested
+    except (OSError, ValueError) as e:
+        st.sidebar.error(f"Não foi possível ler o feed {FEED_PATH}: {e}")
+    else:
+        st.sidebar.caption(
+            f"{feed_stats.rows_ingested:,} eventos ingeridos ({feed_stats.rows_rejected:,} descartados) "
+            f"em {feed_stats.seconds:.1f}s, {feed_stats.rows_per_second:,.0f} linhas/s."
+        )
+        if not feed_index.dates:
+            st.sidebar.warning("O feed não tem eventos válidos; exibindo a simulação.")
+            feed_index = None
+if feed_index is None:
+    data_source = SIMULATION_SOURCE
+else:
+    # A versão do arquivo entra na fonte, que faz parte das chaves dos caches de previsão e mapa
+    data_source = f"{FEED_SOURCE}@{feed_modified_at}"
 
 # --- Filtros de Data e Hora ---
 st.sidebar.subheader("Filtrar por Data e Hora")
-simulated_start_date = datetime.date(2025, 6, 4)
-simulated_end_date = datetime.date(2025, 6, 10) 
+if feed_index is not None:
+    simulated_start_date, simulated_end_date = feed_index.dates[0], feed_index.dates[-1]
+else:
+    simulated_start_date, simulated_end_date = default_window()
 
 selected_date = st.sidebar.date_input(
     "Selecione a Data", 
@@ -222,204 +141,295 @@ selected_hour_range = st.sidebar.slider(
     0, 23, (current_hour, min(current_hour + 1, 23))
 )
 
+st.sidebar.subheader("Nível de Detalhe do Mapa")
+map_zoom = st.sidebar.slider(
+    "Zoom inicial do mapa",
+    3, 18, initial_zoom,
+    help=f"A partir do zoom {RAW_POINTS_MIN_ZOOM} cada ocorrência é exibida individualmente; abaixo disso, as ocorrências são agregadas em células."
+)
+
 st.sidebar.subheader("Tipos de Ocorrência")
 selected_types_checkboxes = [
     st.sidebar.checkbox("Tráfego Intenso", value=True),
     st.sidebar.checkbox("Concentração Turística", value=True),
     st.sidebar.checkbox("Risco de Alagamento", value=True)
 ]
-type_names = ['Tráfego Intenso', 'Concentração Turística', 'Risco de Alagamento']
 active_types = [name for i, name in enumerate(type_names) if selected_types_checkboxes[i]]
 
-data = generate_simulated_data(center_lat, center_lon, selected_city_name, simulated_start_date, simulated_end_date)
-
-filtered_data = data[
-    (data['timestamp'].dt.date == selected_date) &
-    (data['timestamp'].dt.hour >= selected_hour_range[0]) &
-    (data['timestamp'].dt.hour <= selected_hour_range[1]) &
-    (data['type'].isin(active_types))
-].copy()
-
-filtered_data_typed = {
-    'Tráfego Intenso': filtered_data[filtered_data['type'] == 'Tráfego Intenso'],
-    'Concentração Turística': filtered_data[filtered_data['type'] == 'Concentração Turística'],
-    'Risco de Alagamento': filtered_data[filtered_data['type'] == 'Risco de Alagamento'],
-}
+st.sidebar.subheader("Previsão Local")
+show_forecast = st.sidebar.checkbox("Mostrar previsão no mapa", value=True, help="Anéis no pico previsto de cada local nas horas seguintes ao período selecionado.")
+forecast_hours = st.sidebar.slider("Horizonte da previsão (horas)", 2, 4, DEFAULT_HORIZON_HOURS)
+
+# Índice (data, hora, tipo) gravado junto com cada dia: os filtros da sidebar viram fatias
+# do dia selecionado, lidas direto do arquivo mapeado em vez de varreduras do DataFrame.
+# A janela de cada cidade é compartilhada entre sessões e só recebe os dias que faltam.
+@st.cache_resource
+def load_rolling_window(city_lat, city_lon, city_name, seed=DEFAULT_SEED):
+    return RollingWindow(dataset_store, city_lat, city_lon, city_name, seed=seed)
+
+def load_event_index(city_lat, city_lon, city_name, start_date_sim, end_date_sim, seed=DEFAULT_SEED):
+    window = load_rolling_window(city_lat, city_lon, city_name, seed=seed)
+    window.update(start_date_sim, end_date_sim)
+    return window.dataset
+
+with timer.stage("dados") as stage:
+    if feed_index is not None:
+        event_index = feed_index
+    else:
+        event_index = load_event_index(center_lat, center_lon, selected_city_name, simulated_start_date, simulated_end_date)
+    stage.rows = len(event_index)
+
+with timer.stage("filtro") as stage:
+    filtered_data_typed = event_index.query_typed(selected_date, selected_hour_range, active_types)
+    # Só a contagem é usada fora das fatias por tipo: sem concatenar as linhas numa segunda consulta
+    filtered_rows = sum(len(df) for df in filtered_data_typed.values())
+    stage.rows = filtered_rows
+
+# --- Previsão Local das Próximas Horas ---
+# Perfis sazonais ajustados uma vez por janela de dados (forecast.py); a previsão das horas
+# seguintes ao período selecionado é só uma indexação, refeita a cada rerun sem custo
+@st.cache_resource(max_entries=32)
+def load_nowcast(_event_index, data_source, city_name, start_date_sim, end_date_sim):
+    return fit_nowcast(history_frame(_event_index))
+
+def predict_forecast(event_index, data_source, city_name, start_date_sim, end_date_sim, selected_date, hour_range, types, hours):
+    nowcast = load_nowcast(event_index, data_source, city_name, start_date_sim, end_date_sim)
+    if nowcast is None:
+        return None
+    forecast_start = datetime.datetime.combine(selected_date, datetime.time(hour_range[1]))
+    forecast = nowcast.predict(forecast_start, hours, event_index.rain_forecast(selected_date))
+    return forecast[forecast['type'].isin(types)].reset_index(drop=True)
+
+with timer.stage("previsão") as stage:
+    forecast = predict_forecast(event_index, data_source, selected_city_name, simulated_start_date, simulated_end_date, selected_date, selected_hour_range, active_types, forecast_hours)
+    stage.rows = 0 if forecast is None else len(forecast)
 
 # --- Seção do Mapa 3D (Globo) ---
 st.header("📊 Visualização Espaço-Temporal no Globo Interativo")
 st.markdown(f"Explore o **globo interativo** de **{selected_city_name}** para visualizar os padrões. Use os controles na barra lateral para filtrar os dados por tipo, data e horário.")
 
-view_state = pdk.ViewState(
-    latitude=center_lat,
-    longitude=center_lon,
-    zoom=initial_zoom,
-    pitch=50,
-    bearing=0
-)
-
-layers = []
-
-# --- Funções para mapear intensidade para cores (AGORA MAIS DIRETAS E VIBRANTES) ---
-# Retorna uma lista RGBA (0-255) com base na intensidade
-def get_traffic_color(intensity):
-    if intensity >= 7: return [255, 0, 0, 230]      # Vermelho vibrante (Alto Tráfego)
-    elif intensity >= 4: return [255, 140, 0, 200]  # Laranja (Médio Tráfego)
-    else: return [0, 200, 0, 180]                   # Verde (Baixo Tráfego)
-
-def get_tourist_color(intensity):
-    if intensity >= 7: return [0, 0, 200, 230]      # Azul escuro (Muito Turista)
-    elif intensity >= 4: return [0, 100, 255, 200]  # Azul (Turista Moderado)
-    else: return [100, 200, 255, 180]               # Azul claro (Pouco Turista)
-
-def get_flood_risk_color(intensity):
-    if intensity >= 8: return [178, 34, 34, 230]    # Vermelho Tijolo (Risco Crítico)
-    elif intensity >= 5: return [255, 69, 0, 200]   # Vermelho Laranja (Alto Risco)
-    elif intensity >= 2: return [255, 215, 0, 180]  # Amarelo Ouro (Risco Moderado)
-    else: return [30, 144, 255, 160]                # Azul (Baixo Risco)
-
-# --- Camadas com Tooltips Aprimorados e Cores Bonitas ---
-
-# Camada para Tráfego Intenso (ColumnLayer)
-if 'Tráfego Intenso' in active_types and not filtered_data_typed['Tráfego Intenso'].empty:
-    traffic_data = filtered_data_typed['Tráfego Intenso']
-    layers.append(
-        pdk.Layer(
-            "ColumnLayer",
-            traffic_data,
-            get_position=["lon", "lat"],
-            get_fill_color=get_traffic_color,
-            get_elevation="intensity * 50", # Altura da coluna
-            radius=40, # Largura da coluna
-            extruded=True,
-            pickable=True,
-            auto_highlight=True,
-            opacity=0.9,
-            tooltip={
-                "html": "<b>{location_name}</b><br/>"
-                        "Tipo: {type}<br/>"
-                        "Intensidade: {intensity:.1f} / 10<br/>"
-                        "Horário: {timestamp.slice(11,16)}",
-                "style": {"backgroundColor": "rgba(50, 50, 50, 0.8)", "color": "white", "font-size": "14px", "padding": "10px", "border-radius": "5px"} # Estilo melhorado
-            }
-        )
-    )
-
-# Camada para Concentração Turística (ScatterplotLayer)
-if 'Concentração Turística' in active_types and not filtered_data_typed['Concentração Turística'].empty:
-    tourist_data = filtered_data_typed['Concentração Turística']
-    layers.append(
-        pdk.Layer(
-            "ScatterplotLayer",
-            tourist_data,
-            get_position=["lon", "lat"],
-            get_color=get_tourist_color,
-            get_radius="intensity * 8 + 20", # Raio varia com a intensidade
-            pickable=True,
-            auto_highlight=True,
-            opacity=0.8,
-            tooltip={
-                "html": "<b>{location_name}</b><br/>"
-                        "Tipo: {type}<br/>"
-                        "Pessoas: {intensity:.1f} / 10<br/>"
-                        "Horário: {timestamp.slice(11,16)}",
-                "style": {"backgroundColor": "rgba(50, 50, 50, 0.8)", "color": "white", "font-size": "14px", "padding": "10px", "border-radius": "5px"} # Estilo melhorado
-            }
-        )
-    )
-
-# Camada para Risco de Alagamento (ColumnLayer)
-if 'Risco de Alagamento' in active_types and not filtered_data_typed['Risco de Alagamento'].empty:
-    flood_data = filtered_data_typed['Risco de Alagamento']
-    layers.append(
-        pdk.Layer(
-            "ColumnLayer",
-            flood_data,
-            get_position=["lon", "lat"],
-            get_elevation="intensity * 60",
-            radius=40,
-            get_fill_color=get_flood_risk_color,
-            extruded=True,
-            pickable=True,
-            auto_highlight=True,
-            opacity=0.9,
-            tooltip={
-                "html": "<b>{location_name}</b><br/>"
-                        "Tipo: {type}<br/>"
-                        "Risco: {intensity:.1f} / 10<br/>"
-                        "Previsão Chuva: {rain_forecast_mm}mm<br/>"
-                        "Horário: {timestamp.slice(11,16)}",
-                "style": {"backgroundColor": "rgba(50, 50, 50, 0.8)", "color": "white", "font-size": "14px", "padding": "10px", "border-radius": "5px"} # Estilo melhorado
-            }
-        )
+# Camadas e JSON do mapa ficam em cache por (cidade, data, faixa de horas, tipos): widgets
+# que não afetam o mapa (ex.: o botão de insights) reaproveitam o payload já serializado.
+# Cada entrada guarda o deck serializado (dezenas de MB em JSON com muitos pontos) e o cache é
+# do processo inteiro, então ele é pequeno e as entradas expiram após 30 minutos.
+@st.cache_resource(max_entries=32, ttl=30 * 60)
+def build_map_deck(_event_index, data_source, city_name, start_date_sim, end_date_sim, selected_date, hour_range, types, zoom, forecast_hours=0):
+    city = CITIES[city_name]
+    view_state = pdk.ViewState(
+        latitude=city["lat"],
+        longitude=city["lon"],
+        zoom=zoom,
+        pitch=50,
+        bearing=0
     )
+    # Abaixo do zoom de detalhe, os pontos viram células agregadas (média, pico e contagem)
+    typed_frames, radius = level_of_detail(_event_index.query_typed(selected_date, hour_range, types), zoom, city["lat"])
+    peaks = None
+    if forecast_hours:
+        forecast = predict_forecast(_event_index, data_source, city_name, start_date_sim, end_date_sim, selected_date, hour_range, types, forecast_hours)
+        peaks = forecast_peaks(forecast) if forecast is not None else None
+    return build_deck(typed_frames, view_state, radius=radius, forecast_peaks=peaks)
+
+# Pré-aquecimento opcional (GEOPREDICTOR_PREWARM=1): na primeira execução do processo, uma
+# thread grava os datasets de todas as cidades (prewarm.py, em processos separados) e monta o
+# mapa inicial de cada uma (último dia, hora atual, todos os tipos), para que a primeira visita
+# a qualquer cidade já encontre dataset e camadas em cache.
+# Falhas só vão para o log do servidor: o pré-aquecimento é opcional e não afeta a sessão.
+prewarm_logger = logging.getLogger("geopredictor.prewarm")
+
+def prewarm_caches(start_date_sim, end_date_sim, hour_range):
+    try:
+        run_prewarm(start_date_sim, end_date_sim, store=dataset_store)
+        for city_name, city in CITIES.items():
+            city_index = load_event_index(city["lat"], city["lon"], city_name, start_date_sim, end_date_sim)
+            build_map_deck(city_index, SIMULATION_SOURCE, city_name, start_date_sim, end_date_sim, end_date_sim, hour_range, tuple(type_names), city.get("zoom", 10), DEFAULT_HORIZON_HOURS)
+    except subprocess.CalledProcessError as e:
+        prewarm_logger.error("Pré-aquecimento dos datasets falhou (código %s):\n%s", e.returncode, e.stderr)
+    except Exception:
+        prewarm_logger.exception("Pré-aquecimento dos caches falhou.")
+
+# Uma thread por janela de dados: a faixa de horas (_hour_range) fica fora da chave do cache,
+# então mudar a hora ou a data selecionada não dispara outro pré-aquecimento
+@st.cache_resource
+def start_prewarm(start_date_sim, end_date_sim, _hour_range):
+    thread = threading.Thread(target=prewarm_caches, args=(start_date_sim, end_date_sim, _hour_range), name="geopredictor-prewarm", daemon=True)
+    thread.start()
+    return thread
+
+if os.getenv("GEOPREDICTOR_PREWARM") == "1" and data_source == SIMULATION_SOURCE:
+    start_prewarm(simulated_start_date, simulated_end_date, (current_hour, min(current_hour + 1, 23)))
 
 # Renderizar o mapa Pydeck com as camadas dinâmicas
-if layers:
-    r = pdk.Deck(
-        layers=layers,
-        initial_view_state=view_state,
-        map_style="mapbox://styles/mapbox/dark-v11", # Tema escuro para o mapa base
-        tooltip={ # Este tooltip global é um fallback, os das camadas são preferíveis
-            "html": "<b>{location_name}</b><br/>Tipo: {type}<br/>Intensidade: {intensity:.1f}",
-            "style": {"backgroundColor": "rgba(50, 50, 50, 0.8)", "color": "white", "font-size": "14px", "padding": "10px", "border-radius": "5px"}
-        }
-    )
-    st.pydeck_chart(r)
-else:
-    st.info("Nenhum dado selecionado ou filtrado para exibição no mapa. Ajuste seus filtros na barra lateral!")
+# (camadas e serialização entram juntas em "mapa": o JSON é gerado na construção do deck)
+with timer.stage("mapa") as stage:
+    r = build_map_deck(event_index, data_source, selected_city_name, simulated_start_date, simulated_end_date, selected_date, tuple(selected_hour_range), tuple(active_types), map_zoom, forecast_hours if show_forecast else 0)
+    stage.rows = 0 if r is None else sum(layer["length"] if isinstance(r, BinaryDeck) else len(layer.data) for layer in r.layers)
+with timer.stage("envio do mapa"):
+    if isinstance(r, BinaryDeck):
+        components.html(r.html, height=r.height)
+    elif r is not None:
+        st.pydeck_chart(r)
+    else:
+        st.info("Nenhum dado selecionado ou filtrado para exibição no mapa. Ajuste seus filtros na barra lateral!")
+
+# --- Estatísticas do Período ---
+# Resumo calculado numa única agregação; o mesmo objeto alimenta este painel e o prompt
+with timer.stage("resumo") as stage:
+    filtered_summary = summarize_typed(filtered_data_typed)
+    stage.rows = len(filtered_summary.by_location)
+with st.expander("📈 Estatísticas do Período Selecionado"):
+    if filtered_summary.by_type.empty:
+        st.caption("Nenhuma ocorrência para os filtros atuais.")
+    else:
+        stats_table = filtered_summary.by_type[['count', 'mean', 'max', *percentile_columns(filtered_summary), 'n_locations', 'peak_hour']].rename(columns={
+            'count': 'Ocorrências', 'mean': 'Intensidade Média', 'max': 'Pico', 'n_locations': 'Locais', 'peak_hour': 'Hora de Pico',
+        })
+        st.dataframe(stats_table.round(1), use_container_width=True)
+        location_columns = st.columns(len(filtered_summary.types))
+        for column, data_type in zip(location_columns, filtered_summary.types):
+            column.markdown(f"**{data_type}** — locais mais intensos")
+            column.dataframe(
+                filtered_summary.top_locations(data_type)[['mean', 'max', 'count']].round(1).rename(columns={'mean': 'Média', 'max': 'Pico', 'count': 'Ocorrências'}),
+                use_container_width=True,
+            )
+
+with st.expander(f"🔮 Previsão Local para as Próximas {forecast_hours} Horas"):
+    if forecast is None or forecast.empty:
+        st.caption("Sem histórico suficiente para prever os tipos selecionados.")
+    else:
+        hourly_forecast = forecast.pivot_table(index='timestamp', columns='type', values='intensity', aggfunc='mean', observed=True)
+        hourly_forecast.index = hourly_forecast.index.strftime('%d/%m %Hh')
+        hourly_forecast.columns = hourly_forecast.columns.astype(str)
+        st.dataframe(hourly_forecast.round(1).rename_axis(index='Horário', columns=None), use_container_width=True)
+        st.caption("Intensidade média prevista por hora (0 a 10), pelo perfil sazonal de cada local e a previsão de chuva do dia, sem chamar a IA.")
 
 # --- Seção de Insights da IA ---
 st.subheader("✨ Insights Preditivos da IA")
 st.info(f"Aqui, a Inteligência Artificial (Google Gemini) gerará análises e previsões com base nos dados filtrados para **{selected_city_name}**. Os insights serão **acionáveis** para a gestão urbana.")
 
+# Cache de respostas em disco (SQLite), compartilhado entre sessões e reinícios
+@st.cache_resource
+def get_insight_cache():
+    return InsightCache()
+
+# A geração roda numa thread de fundo com streaming; o script só acompanha o job, então o
+# mapa e os filtros continuam utilizáveis enquanto a resposta chega
+@st.cache_resource
+def get_insight_worker(model_name):
+    return InsightWorker(get_model(model_name), cache=get_insight_cache())
+
+def load_insight_worker():
+    # None (com o erro na tela) se o modelo não puder ser configurado; tenta de novo no próximo clique
+    if MODEL_NAME != STUB_MODEL_NAME and not os.getenv("GOOGLE_API_KEY"):
+        st.error("Chave da API do Google Gemini não configurada. Crie um arquivo .env com GOOGLE_API_KEY='sua_chave_aqui'.")
+        return None
+    try:
+        return get_insight_worker(MODEL_NAME)
+    except Exception as e:
+        st.error(f"Erro ao configurar a API da Gemini: {e}. Verifique sua chave e acesso ao modelo '{MODEL_NAME}'.")
+        return None
+
+if "insight_session" not in st.session_state:
+    st.session_state.insight_session = uuid.uuid4().hex
+insight_filters = (selected_city_name, selected_date, tuple(selected_hour_range), tuple(active_types), forecast_hours)
+
+def release_insight_job():
+    job_state = st.session_state.pop("insight_job", None)
+    if job_state is not None:
+        get_insight_worker(MODEL_NAME).release(job_state["key"], st.session_state.insight_session)
+
+# Filtros mudaram: a análise em andamento não vale mais para a tela e é cancelada
+if "insight_job" in st.session_state and st.session_state.insight_job["filters"] != insight_filters:
+    release_insight_job()
+
 if st.button("Gerar Insights Preditivos para o Período Selecionado"):
-    if model:
-        with st.spinner(f"Analisando padrões em {selected_city_name} e gerando insights com a Gemini..."):
-            if filtered_data.empty:
-                st.warning("Não há dados para o período e filtros selecionados para gerar insights. Ajuste seus filtros e tente novamente.")
-            else:
-                summary_data = []
-                for data_type, df in filtered_data_typed.items():
-                    if not df.empty:
-                        avg_intensity = df['intensity'].mean()
-                        max_intensity = df['intensity'].max()
-                        locations = df['location_name'].unique().tolist()
-                        areas = df['area'].unique().tolist()
-                        
-                        summary_data.append(
-                            f"- Tipo: {data_type}\n"
-                            f"  Locais Afetados: {', '.join(locations)}\n"
-                            f"  Áreas Geográficas: {', '.join(areas)}\n"
-                            f"  Intensidade Média: {avg_intensity:.1f} (de 10)\n"
-                            f"  Pico de Intensidade: {max_intensity:.1f} (de 10)\n"
-                        )
-                
+    insight_worker = load_insight_worker()
+    if insight_worker:
+        if not filtered_rows:
+            st.warning("Não há dados para o período e filtros selecionados para gerar insights. Ajuste seus filtros e tente novamente.")
+        else:
+            with timer.stage("prompt"):
+                summary_data = summary_lines(filtered_summary)
                 day_name_for_ai = day_names[selected_date.weekday()]
-                current_rain_forecast = data[data['timestamp'].dt.date == selected_date]['rain_forecast_mm'].iloc[0] if not data.empty else 0
-
-
-                prompt_text = (
-                    f"Você é um analista de dados urbanos para a cidade de **{selected_city_name}**, utilizando um sistema de previsão com IA.\n"
-                    f"A data de análise é {selected_date.strftime('%d/%m/%Y')} e o período de interesse é das {selected_hour_range[0]}h às {selected_hour_range[1]}h. "
-                    f"O dia da semana é {day_name_for_ai}. A previsão de chuva simulada para este dia é de {current_rain_forecast}mm.\n\n"
-                    f"**Dados Observados para o Período e Local Selecionados:**\n"
-                    f"{'Não há ocorrências significativas para este período e localização.' if not summary_data else ' '.join(summary_data)}\n\n"
-                    f"Com base nesses dados e no conhecimento de padrões urbanos típicos (tráfego de pico, fluxo turístico, áreas de alagamento) para uma cidade como {selected_city_name}: \n"
-                    f"1. **Análise dos Padrões:** Descreva de forma concisa o que está acontecendo ou o que é esperado acontecer em **{selected_city_name}** durante o período selecionado, destacando as áreas e tipos de ocorrência mais relevantes.\n"
-                    f"2. **Previsão Futura:** Com base nos padrões históricos (implícitos no dataset simulado) e nos dados atuais, preveja como a situação pode evoluir nas **próximas 2-4 horas** em **{selected_city_name}**.\n"
-                    f"3. **Recomendações Acionáveis:** Forneça 2-3 recomendações específicas e práticas para os órgãos responsáveis (Ex: Secretaria de Trânsito, Defesa Civil, Secretaria de Turismo, etc.) para gerenciar a situação ou otimizar recursos em **{selected_city_name}**.\n"
-                    f"Formate sua resposta em seções claras: **Análise dos Padrões**, **Previsão Futura** e **Recomendações Acionáveis**."
-                )
-
-                try:
-                    response = model.generate_content(prompt_text)
-                    st.markdown(f"**Análise da Gemini para {selected_city_name} em {selected_date.strftime('%d/%m/%Y')} das {selected_hour_range[0]}h às {selected_hour_range[1]}h ({day_name_for_ai}):**")
-                    st.write(response.text)
-                except Exception as e:
-                    st.error(f"Erro ao chamar a API da Gemini. Verifique sua chave ou cota de uso: {e}")
-                    st.warning("Tente ajustar os filtros ou o prompt se o erro persistir. Certifique-se de que a chave da API está correta e que você tem conexão com a internet.")
+                current_rain_forecast = event_index.rain_forecast(selected_date)
+                forecast_data = forecast_lines(forecast) if forecast is not None else []
+                prompt_text = build_prompt(selected_city_name, selected_date, selected_hour_range, current_rain_forecast, summary_data, forecast_data, forecast_hours)
+                cache_key = prompt_cache_key(MODEL_NAME, selected_city_name, selected_date, selected_hour_range, active_types, current_rain_forecast, summary_data, forecast_data)
+
+            release_insight_job()
+            insight_worker.submit(cache_key, prompt_text, subscriber=st.session_state.insight_session)
+            st.session_state.insight_job = {
+                "key": cache_key,
+                "filters": insight_filters,
+                "header": f"**Análise da Gemini para {selected_city_name} em {selected_date.strftime('%d/%m/%Y')} das {selected_hour_range[0]}h às {selected_hour_range[1]}h ({day_name_for_ai}):**",
+            }
+
+def show_insight_job(job_state, polling):
+    job = get_insight_worker(MODEL_NAME).get(job_state["key"])
+    if job is None:
+        return
+    if polling and job.finished:
+        # Terminou durante o acompanhamento: um rerun completo desliga o polling do fragmento
+        st.rerun()
+    st.markdown(job_state["header"])
+    if job.status == FAILED:
+        st.error(f"Erro ao chamar a API da Gemini. Verifique sua chave ou cota de uso: {job.error}")
+        st.warning("Tente ajustar os filtros ou o prompt se o erro persistir. Certifique-se de que a chave da API está correta e que você tem conexão com a internet.")
+    elif job.status == CANCELLED:
+        st.info("Geração de insights cancelada.")
+    elif not job.finished:
+        if job.text:
+            st.markdown(job.text + " ▌")
+        else:
+            retry_note = f" (tentativa {job.attempts})" if job.attempts > 1 else ""
+            st.caption(f"Analisando padrões em {selected_city_name} e gerando insights com a Gemini...{retry_note}")
+        if st.button("Cancelar geração", key="cancel_insight"):
+            release_insight_job()
+            st.rerun()
+    else:
+        st.write(job.text)
+        if job.source == "cache":
+            st.caption("Resposta reaproveitada do cache de insights (mesma cidade, período e dados).")
+        elif job.time_to_first_token is not None:
+            st.caption(f"Primeiro trecho em {job.time_to_first_token:.1f}s, resposta completa em {job.latency:.1f}s.")
+
+if "insight_job" in st.session_state:
+    job_state = st.session_state.insight_job
+    job = get_insight_worker(MODEL_NAME).get(job_state["key"])
+    polling = job is not None and not job.finished
+    if job is not None and job.finished and job.source == "generated" and job.latency is not None and not job_state.get("timed"):
+        # A chamada roda na thread do worker; entra nos tempos só do primeiro rerun em que aparece pronta
+        job_state["timed"] = True
+        timer.record("modelo de IA", job.latency)
+        if job.time_to_first_token is not None:
+            timer.record("modelo de IA (primeiro trecho)", job.time_to_first_token)
+    # Só o fragmento é reexecutado enquanto o texto chega; o resto da página fica intacto
+    st.fragment(show_insight_job, run_every=POLL_INTERVAL_SECONDS if polling else None)(job_state, polling)
 
 # --- Rodapé ---
 st.markdown("---")
-st.markdown("Construído com ❤️ usando Streamlit, Pydeck e Google Gemini API.")
\ No newline at end of file
+st.markdown("Construído com ❤️ usando Streamlit, Pydeck e Google Gemini API.")
+
+if DEBUG_PANEL:
+    runs = st.session_state.setdefault("stage_timings", [])
+    runs.append(timer.as_dict())
+    del runs[:-DEBUG_HISTORY_RUNS]
+    with st.sidebar.expander("⏱️ Tempos por Etapa (depuração)", expanded=True):
+        timings = timer.to_frame()
+        timings["ms"] = (timings["seconds"] * 1000).round(1)
+        columns = ["stage", "ms", "rows"]
+        # Variação do RSS do processo na etapa; sem /proc (fora do Linux) a coluna não é exibida
+        if timings["rss_delta_bytes"].notna().any():
+            timings["Δ RSS (MB)"] = (timings["rss_delta_bytes"].astype(float) / 1024**2).round(1)
+            columns.append("Δ RSS (MB)")
+        if timer.track_memory:
+            timings["alocado (MB)"] = (timings["peak_alloc_bytes"].astype(float) / 1024**2).round(1)
+            columns.append("alocado (MB)")
+        st.dataframe(timings[columns].rename(columns={"stage": "Etapa", "rows": "Linhas"}), hide_index=True, use_container_width=True)
+        st.caption(f"Total do rerun: {timer.total_seconds * 1000:.0f} ms (sem o modelo de IA, que roda em segundo plano).")
+        st.download_button(
+            "Exportar JSON",
+            data=json.dumps(runs, indent=2, ensure_ascii=False),
+            file_name="geopredictor_stage_timings.json",
+            mime="application/json",
+        )
\ No newline at end of file
@@ -0,0 +1,207 @@
+import argparse
+import datetime
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import simulation
+from cities import CITIES
+from dataset_store import default_window
+from event_index import EventIndex
+from forecast import DEFAULT_HORIZON_HOURS, fit_nowcast, forecast_lines
+from insight_cache import InsightCache
+from insight_worker import DEFAULT_MAX_RETRIES, DEFAULT_TIMEOUT_SECONDS, DONE, RateLimiter, InsightWorker
+from insights import build_prompt, prompt_cache_key, summarize_types
+from llm_backends import GEMINI_MODEL_NAME, STUB_MODEL_NAME, StubModel, load_gemini_model
+from simulation import DEFAULT_SEED, type_names
+
+# --- Briefings em Lote ---
+# Gera os insights de várias cidades e janelas (data, faixa de horas) sem a interface:
+# cada job monta o mesmo resumo e prompt do botão do app, as chamadas passam pelo
+# InsightWorker (pool limitado + RateLimiter + retentativas + cache em disco) e o resultado
+# vai para um arquivo JSONL ou Parquet. Sem --start-date, usa o último dia da janela do app
+# (hoje, ou GEOPREDICTOR_WINDOW_END), para o lote de cada manhã cobrir o mesmo dia. Ex.:
+#   python batch_insights.py --hours 7-9 17-19 --backend stub
+#   python batch_insights.py --start-date 2025-06-10 --end-date 2025-06-12 --backend stub
+DEFAULT_CONCURRENCY = 4
+DEFAULT_RATE_PER_SECOND = 2.0
+DEFAULT_OUTPUT = "briefings.jsonl"
+
+
+def parse_hour_window(text):
+    start, _, end = text.partition("-")
+    hour_range = (int(start), int(end or start))
+    if not 0 <= hour_range[0] <= hour_range[1] <= 23:
+        raise argparse.ArgumentTypeError(f"Faixa de horas inválida: {text!r} (use H-H entre 0 e 23).")
+    return hour_range
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Gera briefings de insights para várias cidades e períodos.")
+    parser.add_argument("--cities", nargs="+", default=list(CITIES), metavar="CIDADE", help="Cidades de CITIES (padrão: todas).")
+    parser.add_argument("--start-date", type=datetime.date.fromisoformat, default=default_window()[1],
+                        help="Padrão: último dia da janela do app (hoje ou GEOPREDICTOR_WINDOW_END).")
+    parser.add_argument("--end-date", type=datetime.date.fromisoformat, default=None, help="Padrão: igual a --start-date.")
+    parser.add_argument("--hours", nargs="+", type=parse_hour_window, default=[(0, 23)], metavar="H-H", help="Faixas de horas, ex.: 7-9 17-19.")
+    parser.add_argument("--types", nargs="+", choices=type_names, default=list(type_names), metavar="TIPO")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--forecast-hours", type=int, default=DEFAULT_HORIZON_HOURS, help="Horizonte da previsão local no prompt (0 desliga).")
+    parser.add_argument("--history-days", type=int, default=28, help="Dias de histórico antes de --start-date para ajustar a previsão local.")
+    parser.add_argument("--backend", choices=["gemini", STUB_MODEL_NAME], default="gemini")
+    parser.add_argument("--stub-latency", type=float, default=0.5, help="Latência do modelo local, em segundos.")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Chamadas simultâneas ao modelo.")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE_PER_SECOND, help="Máximo de chamadas por segundo.")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT_SECONDS)
+    parser.add_argument("--retries", type=int, default=DEFAULT_MAX_RETRIES)
+    parser.add_argument("--no-cache", action="store_true", help="Ignora o cache de insights em disco.")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Arquivo .jsonl ou .parquet.")
+    args = parser.parse_args(argv)
+    unknown = [city for city in args.cities if city not in CITIES]
+    if unknown:
+        parser.error(f"Cidades desconhecidas: {unknown}. Disponíveis: {list(CITIES)}.")
+    args.end_date = args.end_date or args.start_date
+    if args.end_date < args.start_date:
+        parser.error("--end-date anterior a --start-date.")
+    return args
+
+
+def plan_jobs(city_names, start_date, end_date, hour_windows, types, model_name, seed=DEFAULT_SEED,
+              forecast_hours=DEFAULT_HORIZON_HOURS, history_days=28):
+    # Um dataset e um índice por cidade; um job por (cidade, data, faixa de horas). A previsão
+    # local é ajustada uma vez por cidade no histórico e no período e entra no prompt.
+    jobs = []
+    dates = pd.date_range(start_date, end_date, freq="D").date
+    history_start = start_date - datetime.timedelta(days=history_days)
+    for city_name in city_names:
+        city = CITIES[city_name]
+        data = simulation.generate_simulated_data(city["lat"], city["lon"], city_name, history_start, end_date, seed=seed, compact=True)
+        event_index = EventIndex(data)
+        nowcast = fit_nowcast(data) if forecast_hours else None
+        for date in dates:
+            rain_forecast_mm = event_index.rain_forecast(date)
+            for hour_range in hour_windows:
+                summary_data = summarize_types(event_index.query_typed(date, hour_range, types))
+                forecast_data = []
+                if nowcast is not None:
+                    forecast = nowcast.predict(datetime.datetime.combine(date, datetime.time(hour_range[1])), forecast_hours, rain_forecast_mm)
+                    forecast_data = forecast_lines(forecast[forecast['type'].isin(types)])
+                jobs.append({
+                    "city": city_name,
+                    "date": date,
+                    "hour_range": hour_range,
+                    "types": list(types),
+                    "key": prompt_cache_key(model_name, city_name, date, hour_range, types, rain_forecast_mm, summary_data, forecast_data),
+                    "prompt": build_prompt(city_name, date, hour_range, rain_forecast_mm, summary_data, forecast_data, forecast_hours),
+                })
+    return jobs
+
+
+def run_batch(worker, jobs, model_name):
+    # Envia todos os jobs ao worker e espera; retorna um registro por job, na ordem de entrada
+    submitted = [(job, worker.submit(job["key"], job["prompt"])) for job in jobs]
+    records = []
+    for job, insight in submitted:
+        insight.wait()
+        records.append({
+            "city": job["city"],
+            "date": job["date"].isoformat(),
+            "hour_start": job["hour_range"][0],
+            "hour_end": job["hour_range"][1],
+            "types": job["types"],
+            "model": model_name,
+            "key": job["key"],
+            "status": insight.status,
+            "source": insight.source,
+            "attempts": insight.attempts,
+            "latency_s": insight.latency,
+            "time_to_first_token_s": insight.time_to_first_token if insight.source == "generated" else None,
+            "queue_wait_s": insight.queue_wait if insight.source == "generated" else None,
+            "response": insight.text if insight.status == DONE else None,
+            "error": None if insight.error is None else repr(insight.error),
+        })
+    return records
+
+
+def summarize_run(records, wall_seconds):
+    df = pd.DataFrame(records)
+    generated = df[(df["source"] == "generated") & (df["status"] == DONE)]
+    latencies = generated["latency_s"].to_numpy(dtype=np.float64)
+    report = {
+        "jobs": len(df),
+        "generated": len(generated),
+        "cached": int((df["source"] == "cache").sum()),
+        "failed": int((df["status"] != DONE).sum()),
+        "wall_s": wall_seconds,
+        "jobs_per_s": len(df) / wall_seconds if wall_seconds else float("nan"),
+    }
+    if len(latencies):
+        report.update({
+            "latency_p50_s": float(np.percentile(latencies, 50)),
+            "latency_p95_s": float(np.percentile(latencies, 95)),
+            "latency_max_s": float(latencies.max()),
+            "ttft_mean_s": float(generated["time_to_first_token_s"].mean()),
+            "queue_wait_mean_s": float(generated["queue_wait_s"].mean()),
+        })
+    return report
+
+
+def write_records(records, path):
+    if path.endswith(".parquet"):
+        pd.DataFrame(records).to_parquet(path, index=False)
+        return
+    with open(path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def load_model(args):
+    if args.backend == STUB_MODEL_NAME:
+        return StubModel(latency_seconds=args.stub_latency), STUB_MODEL_NAME
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if not api_key:
+        sys.exit("Chave da API do Google Gemini não configurada. Crie um arquivo .env com GOOGLE_API_KEY='sua_chave_aqui' ou use --backend stub.")
+    return load_gemini_model(api_key), GEMINI_MODEL_NAME
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    model, model_name = load_model(args)
+
+    start = time.perf_counter()
+    jobs = plan_jobs(args.cities, args.start_date, args.end_date, args.hours, args.types, model_name, seed=args.seed,
+                     forecast_hours=args.forecast_hours, history_days=args.history_days)
+    prepare_seconds = time.perf_counter() - start
+
+    worker = InsightWorker(
+        model,
+        cache=None if args.no_cache else InsightCache(),
+        timeout_seconds=args.timeout,
+        max_retries=args.retries,
+        max_workers=args.concurrency,
+        max_finished_jobs=len(jobs),
+        rate_limiter=RateLimiter(args.rate),
+    )
+    start = time.perf_counter()
+    try:
+        records = run_batch(worker, jobs, model_name)
+    finally:
+        worker.shutdown()
+    wall_seconds = time.perf_counter() - start
+
+    write_records(records, args.output)
+    report = summarize_run(records, wall_seconds)
+    print(f"{len(jobs)} jobs preparados em {prepare_seconds:.2f}s; resultados em {args.output}")
+    for name, value in report.items():
+        print(f"  {name}: {value:.3f}" if isinstance(value, float) else f"  {name}: {value}")
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,244 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import pydeck as pdk
+
+from cities import CITIES
+from dataset_store import DatasetStore, RollingWindow
+from forecast import DEFAULT_HORIZON_HOURS, fit_nowcast, forecast_lines, forecast_peaks, history_frame
+from insight_worker import DONE, InsightWorker
+from insights import build_prompt, summary_lines
+from llm_backends import StubModel
+from map_layers import build_deck
+from simulation import type_names
+from spatial_bins import level_of_detail
+from stage_timer import StageTimer
+from summary import summarize_typed
+
+# --- Benchmark das Etapas do App ---
+# Reproduz, sem a interface, as etapas de um rerun (geração e abertura dos dados, filtro,
+# resumo, previsão, camadas + JSON do mapa, prompt e chamada ao modelo local simulado) para
+# combinações de número de cidades, tamanho do período e largura do filtro de horas, e
+# compara com um baseline gravado. Cada etapa vale o menor tempo entre as repetições (como
+# no timeit): o mínimo é bem menos sensível a ruído da máquina do que a média ou a mediana.
+# O baseline só é comparável se gravado na mesma máquina. Ex.:
+#   python benchmark.py                       # mede e compara com benchmark_baseline.json
+#   python benchmark.py --save-baseline       # mede e grava o novo baseline
+# Sai com código 1 se alguma etapa ficar mais lenta que o baseline além da tolerância.
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+DEFAULT_CITY_COUNTS = (1, 3, 10)
+DEFAULT_DAY_COUNTS = (7, 30, 90)
+DEFAULT_HOUR_WIDTHS = (1, 6, 24)
+DEFAULT_REPEATS = 3
+DEFAULT_TOLERANCE = 0.5 # Regressão: 50% mais lento que o baseline...
+DEFAULT_MIN_DELTA_SECONDS = 0.005 # ... e pelo menos 5 ms a mais (ruído em etapas rápidas)
+WINDOW_END = datetime.date(2025, 6, 30) # Período fixo, para que os dados sejam os mesmos entre execuções
+FILTER_START_HOUR = 8
+
+
+def hour_range_for(width):
+    if width >= 24:
+        return (0, 23)
+    return (FILTER_START_HOUR, FILTER_START_HOUR + width - 1)
+
+
+def measure_data(city_names, days, root):
+    # Etapas que dependem só de (cidades, dias): geração a frio, abertura já persistida e ajuste da previsão
+    timer = StageTimer()
+    start_date = WINDOW_END - datetime.timedelta(days=days - 1)
+    store = DatasetStore(root)
+    with timer.stage("geração") as stage:
+        windows = [RollingWindow(store, CITIES[name]["lat"], CITIES[name]["lon"], name) for name in city_names]
+        for window in windows:
+            window.update(start_date, WINDOW_END)
+        stage.rows = sum(len(window.dataset) for window in windows)
+    datasets = {}
+    with timer.stage("abertura") as stage:
+        for city_name in city_names:
+            city = CITIES[city_name]
+            window = RollingWindow(store, city["lat"], city["lon"], city_name)
+            window.update(start_date, WINDOW_END)
+            datasets[city_name] = window.dataset
+        stage.rows = sum(len(dataset) for dataset in datasets.values())
+    models = {}
+    with timer.stage("previsão (ajuste)") as stage:
+        for city_name, dataset in datasets.items():
+            models[city_name] = fit_nowcast(history_frame(dataset))
+        stage.rows = sum(len(model) for model in models.values())
+    return timer, datasets, models
+
+
+def measure_query(city_names, datasets, models, hour_width, worker):
+    # Etapas de um rerun com filtro, para cada cidade (somadas por etapa em run_benchmark)
+    timer = StageTimer()
+    hour_range = hour_range_for(hour_width)
+    for city_name in city_names:
+        city, dataset, model = CITIES[city_name], datasets[city_name], models[city_name]
+        with timer.stage("filtro") as stage:
+            typed_frames = dataset.query_typed(WINDOW_END, hour_range, type_names)
+            filtered = dataset.query(WINDOW_END, hour_range, type_names)
+            stage.rows = len(filtered)
+        with timer.stage("resumo") as stage:
+            summary = summarize_typed(typed_frames)
+            stage.rows = len(summary.by_location)
+        with timer.stage("previsão") as stage:
+            forecast = model.predict(datetime.datetime.combine(WINDOW_END, datetime.time(hour_range[1])), DEFAULT_HORIZON_HOURS, dataset.rain_forecast(WINDOW_END))
+            peaks = forecast_peaks(forecast)
+            stage.rows = len(forecast)
+        with timer.stage("mapa (camadas + JSON)") as stage:
+            zoom = city.get("zoom", 10)
+            view_state = pdk.ViewState(latitude=city["lat"], longitude=city["lon"], zoom=zoom, pitch=50, bearing=0)
+            frames, radius = level_of_detail(typed_frames, zoom, city["lat"])
+            build_deck(frames, view_state, radius=radius, forecast_peaks=peaks)
+            stage.rows = sum(len(df) for df in frames.values()) + len(peaks)
+        with timer.stage("prompt") as stage:
+            summary_data = summary_lines(summary)
+            prompt_text = build_prompt(city_name, WINDOW_END, hour_range, dataset.rain_forecast(WINDOW_END), summary_data,
+                                       forecast_lines(forecast), DEFAULT_HORIZON_HOURS)
+            stage.rows = len(summary_data)
+        with timer.stage("modelo (stub)") as stage:
+            job = worker.submit(f"benchmark|{time.perf_counter_ns()}|{city_name}", prompt_text)
+            job.wait()
+            if job.status != DONE:
+                raise RuntimeError(f"Modelo simulado falhou no benchmark: {job.error!r}")
+            stage.rows = len(job.chunks)
+    return timer
+
+
+def run_benchmark(city_counts=DEFAULT_CITY_COUNTS, day_counts=DEFAULT_DAY_COUNTS, hour_widths=DEFAULT_HOUR_WIDTHS,
+                  repeats=DEFAULT_REPEATS, stub_latency=0.0, progress=None):
+    # Retorna {"results": {cenário: {etapa: {"seconds": melhor tempo, "rows": n}}}, ...}
+    all_cities = list(CITIES)
+    worker = InsightWorker(StubModel(latency_seconds=stub_latency), max_finished_jobs=1)
+    samples = {}
+
+    def collect(scenario, timer):
+        rows = {}
+        for record in timer.records:
+            rows[record.name] = rows.get(record.name, 0) + (record.rows or 0)
+        for name, seconds in timer.seconds_by_stage().items():
+            samples.setdefault(scenario, {}).setdefault(name, {"seconds": [], "rows": rows[name]})["seconds"].append(seconds)
+
+    try:
+        for n_cities in city_counts:
+            city_names = all_cities[:n_cities]
+            for days in day_counts:
+                data_scenario = f"{len(city_names)}c_{days}d"
+                for _ in range(repeats):
+                    # Diretório novo a cada repetição: a geração é sempre medida a frio
+                    with tempfile.TemporaryDirectory() as root:
+                        timer, datasets, models = measure_data(city_names, days, root)
+                        collect(data_scenario, timer)
+                        for width in hour_widths:
+                            collect(f"{data_scenario}_{width}h", measure_query(city_names, datasets, models, width, worker))
+                if progress:
+                    progress(data_scenario)
+    finally:
+        worker.shutdown()
+
+    results = {
+        scenario: {name: {"seconds": min(entry["seconds"]), "rows": entry["rows"]} for name, entry in stages.items()}
+        for scenario, stages in samples.items()
+    }
+    return {
+        "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "config": {"city_counts": list(city_counts), "day_counts": list(day_counts), "hour_widths": list(hour_widths),
+                   "repeats": repeats, "stub_latency": stub_latency},
+        "results": results,
+    }
+
+
+def compare(current, baseline, tolerance=DEFAULT_TOLERANCE, min_delta=DEFAULT_MIN_DELTA_SECONDS):
+    # Uma linha por (cenário, etapa) presente nos dois; status "regressão", "melhora" ou "ok"
+    rows = []
+    for scenario, stages in current["results"].items():
+        for name, entry in stages.items():
+            reference = baseline["results"].get(scenario, {}).get(name)
+            if reference is None:
+                continue
+            seconds, reference_seconds = entry["seconds"], reference["seconds"]
+            delta = seconds - reference_seconds
+            status = "ok"
+            if delta > min_delta and seconds > reference_seconds * (1 + tolerance):
+                status = "regressão"
+            elif -delta > min_delta and reference_seconds > seconds * (1 + tolerance):
+                status = "melhora"
+            rows.append({
+                "scenario": scenario,
+                "stage": name,
+                "seconds": seconds,
+                "baseline_seconds": reference_seconds,
+                "ratio": seconds / reference_seconds if reference_seconds else float("inf"),
+                "status": status,
+            })
+    return rows
+
+
+def print_results(report):
+    for scenario, stages in report["results"].items():
+        timings = ", ".join(f"{name} {entry['seconds'] * 1000:.1f} ms" for name, entry in stages.items())
+        print(f"  {scenario}: {timings}")
+
+
+def print_comparison(rows):
+    changed = [row for row in rows if row["status"] != "ok"]
+    for row in changed:
+        print(f"  [{row['status']}] {row['scenario']} / {row['stage']}: {row['seconds'] * 1000:.1f} ms "
+              f"(baseline {row['baseline_seconds'] * 1000:.1f} ms, {row['ratio']:.2f}x)")
+    print(f"{len(rows)} etapas comparadas: {sum(row['status'] == 'regressão' for row in rows)} regressões, "
+          f"{sum(row['status'] == 'melhora' for row in rows)} melhoras")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Mede as etapas do GeoPredictor e compara com um baseline.")
+    parser.add_argument("--cities", nargs="+", type=int, default=list(DEFAULT_CITY_COUNTS), metavar="N", help="Números de cidades.")
+    parser.add_argument("--days", nargs="+", type=int, default=list(DEFAULT_DAY_COUNTS), metavar="DIAS", help="Tamanhos do período.")
+    parser.add_argument("--hours", nargs="+", type=int, default=list(DEFAULT_HOUR_WIDTHS), metavar="H", help="Larguras do filtro de horas.")
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS)
+    parser.add_argument("--stub-latency", type=float, default=0.0, help="Latência do modelo simulado, em segundos.")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Grava o resultado como novo baseline em vez de comparar.")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--output", default=None, help="Grava o resultado desta execução em JSON.")
+    args = parser.parse_args(argv)
+    if any(n < 1 or n > len(CITIES) for n in args.cities):
+        parser.error(f"--cities aceita de 1 a {len(CITIES)}.")
+    if any(width < 1 for width in args.hours):
+        parser.error("--hours deve ser positivo.")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    start = time.perf_counter()
+    report = run_benchmark(args.cities, args.days, args.hours, args.repeats, args.stub_latency,
+                           progress=lambda scenario: print(f"  {scenario} concluído", file=sys.stderr))
+    print(f"Benchmark em {time.perf_counter() - start:.1f}s (melhor de {args.repeats} repetições):")
+    print_results(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Baseline gravado em {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"Sem baseline em {args.baseline}; rode com --save-baseline para criar um.")
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    rows = compare(report, baseline, args.tolerance)
+    print_comparison(rows)
+    return 1 if any(row["status"] == "regressão" for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,216 @@
+import base64
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# --- Transporte Binário para Camadas Grandes ---
+# O st.pydeck_chart só aceita o JSON do deck.gl, em que cada ponto vira um objeto com chaves
+# repetidas. Acima de BINARY_TRANSPORT_MIN_POINTS pontos o mapa é enviado como atributos
+# binários do deck.gl (posições float32, cores uint8, tamanhos float32) codificados em base64
+# e decodificados para typed arrays no navegador, sem parse de um objeto por linha.
+BINARY_TRANSPORT_MIN_POINTS = int(os.getenv("GEOPREDICTOR_BINARY_MIN_POINTS", "20000"))
+
+DECKGL_SCRIPT = "https://unpkg.com/deck.gl@9.0/dist.min.js"
+MAPLIBRE_SCRIPT = "https://unpkg.com/maplibre-gl@3.6.2/dist/maplibre-gl.js"
+MAPLIBRE_CSS = "https://unpkg.com/maplibre-gl@3.6.2/dist/maplibre-gl.css"
+# Estilo escuro da Carto (não exige token, ao contrário do estilo Mapbox do st.pydeck_chart)
+BASEMAP_STYLE = "https://basemaps.cartocdn.com/gl/dark-matter-gl-style/style.json"
+MAP_HEIGHT = 500
+MISSING_LABEL = "—" # Rótulo exibido no tooltip para valores nulos
+
+
+def encode_array(values, dtype):
+    array = np.ascontiguousarray(values, dtype=dtype)
+    return {"dtype": np.dtype(dtype).name, "b64": base64.b64encode(array.tobytes()).decode("ascii")}
+
+
+def encode_labels(values):
+    # Colunas de texto viram códigos inteiros + lista de rótulos distintos; uint16 basta
+    # até 65536 rótulos, acima disso os códigos vão em uint32
+    codes, labels = pd.factorize(pd.Series(values, copy=False))
+    labels = [str(label) for label in labels]
+    missing = codes < 0
+    if missing.any():
+        # O nulo (código -1) ganha um rótulo próprio em vez de estourar no cast para inteiro sem sinal
+        codes = np.where(missing, len(labels), codes)
+        labels.append(MISSING_LABEL)
+    dtype = np.uint16 if len(labels) <= np.iinfo(np.uint16).max + 1 else np.uint32
+    return {**encode_array(codes, dtype), "labels": labels}
+
+
+def encode_binary_layer(layer_id, layer_type, positions, colors, color_accessor, sizes, size_accessor, props, tooltip, tooltip_fields):
+    # positions: (N, 2) lon/lat; colors: (N, 4) RGBA uint8; sizes: (N,) já em unidades do deck.gl.
+    # tooltip: {"html", "style"} com campos {nome}; tooltip_fields: {nome: array numérico ou de
+    # texto} usado para preencher o tooltip pelo índice do ponto no navegador
+    fields = {}
+    for name, values in tooltip_fields.items():
+        numeric = pd.api.types.is_numeric_dtype(values) and not isinstance(values.dtype, pd.CategoricalDtype)
+        fields[name] = encode_array(values, np.float32) if numeric else encode_labels(values)
+    return {
+        "id": layer_id,
+        "type": layer_type,
+        "length": int(len(positions)),
+        "attributes": {
+            "getPosition": {**encode_array(positions, np.float32), "size": 2},
+            color_accessor: {**encode_array(colors, np.uint8), "size": 4, "normalized": True},
+            size_accessor: {**encode_array(sizes, np.float32), "size": 1},
+        },
+        "props": props,
+        "tooltip": tooltip,
+        "fields": fields,
+    }
+
+
+class BinaryDeck:
+    # Equivalente binário do PreserializedDeck: guarda o HTML pronto para st.components.v1.html
+    def __init__(self, layers, view_state, height=MAP_HEIGHT):
+        self.layers = layers
+        self.height = height
+        self.html = render_binary_html(layers, view_state, height)
+
+    @property
+    def payload_bytes(self):
+        return len(self.html.encode("utf-8"))
+
+
+def render_binary_html(layers, view_state, height=MAP_HEIGHT):
+    spec = json.dumps({"layers": layers, "viewState": view_state}, separators=(",", ":"))
+    return _HTML_TEMPLATE.format(
+        deckgl_script=DECKGL_SCRIPT,
+        maplibre_script=MAPLIBRE_SCRIPT,
+        maplibre_css=MAPLIBRE_CSS,
+        basemap_style=json.dumps(BASEMAP_STYLE),
+        height=height,
+        spec=spec.replace("</", "<\\/"),
+    )
+
+
+_HTML_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="UTF-8" />
+<script src="{deckgl_script}"></script>
+<script src="{maplibre_script}"></script>
+<link href="{maplibre_css}" rel="stylesheet" />
+<style>html, body, #map {{ margin: 0; width: 100%; height: {height}px; background: #111; }}</style>
+</head>
+<body>
+<div id="map"></div>
+<script>
+const spec = {spec};
+const TYPED = {{float32: Float32Array, uint8: Uint8Array, uint16: Uint16Array, uint32: Uint32Array}};
+
+function decode(encoded) {{
+  const bytes = Uint8Array.from(atob(encoded.b64), c => c.charCodeAt(0));
+  return new TYPED[encoded.dtype](bytes.buffer);
+}}
+
+const layers = spec.layers.map(layer => {{
+  const attributes = {{}};
+  for (const [accessor, attr] of Object.entries(layer.attributes)) {{
+    attributes[accessor] = {{value: decode(attr), size: attr.size, normalized: attr.normalized}};
+  }}
+  const fields = {{}};
+  for (const [name, field] of Object.entries(layer.fields)) {{
+    fields[name] = {{values: decode(field), labels: field.labels}};
+  }}
+  return new deck[layer.type]({{
+    id: layer.id,
+    data: {{length: layer.length, attributes}},
+    pickable: true,
+    autoHighlight: true,
+    ...layer.props,
+    tooltip: layer.tooltip,
+    fields
+  }});
+}});
+
+function fieldValue(field, index) {{
+  const value = field.values[index];
+  if (field.labels) return field.labels[value];
+  return Number.isInteger(value) ? value : value.toFixed(1);
+}}
+
+new deck.DeckGL({{
+  container: 'map',
+  mapStyle: {basemap_style},
+  initialViewState: spec.viewState,
+  controller: true,
+  layers,
+  getTooltip: ({{index, layer}}) => {{
+    if (!layer || index < 0) return null;
+    const {{fields, tooltip}} = layer.props;
+    const html = tooltip.html.replace(/{{(\\w+)}}/g, (match, name) => fields[name] ? fieldValue(fields[name], index) : '');
+    return {{html, style: tooltip.style}};
+  }}
+}});
+</script>
+</body>
+</html>
+"""
+
+
+def benchmark_transport(point_counts=(1_000, 10_000, 50_000, 200_000), repeats=3):
+    # Compara tamanho do payload e tempo de codificação: JSON do pydeck x atributos binários
+    # (e Arrow IPC como referência, se o pyarrow estiver instalado)
+    import time
+
+    import pydeck as pdk
+
+    from map_layers import build_deck
+
+    try:
+        import pyarrow as pa
+    except ImportError:
+        pa = None
+
+    rng = np.random.default_rng(0)
+    view_state = pdk.ViewState(latitude=-7.1197, longitude=-34.8450, zoom=11)
+    rows = []
+    for n_points in point_counts:
+        df = pd.DataFrame({
+            'lat': (-7.1197 + rng.normal(0, 0.02, n_points)).astype(np.float32),
+            'lon': (-34.8450 + rng.normal(0, 0.02, n_points)).astype(np.float32),
+            'intensity': rng.uniform(1, 10, n_points).astype(np.float32),
+            'type': pd.Categorical(['Tráfego Intenso'] * n_points),
+            'location_name': pd.Categorical(rng.choice([f"Local {i}" for i in range(200)], n_points)),
+            'timestamp': pd.Timestamp("2025-06-10") + pd.to_timedelta(rng.integers(0, 24, n_points), unit='h'),
+            'rain_forecast_mm': np.zeros(n_points, dtype=np.int16),
+        })
+        typed = {'Tráfego Intenso': df}
+
+        def timed(build):
+            best, result = float("inf"), None
+            for _ in range(repeats):
+                start = time.perf_counter()
+                result = build()
+                best = min(best, time.perf_counter() - start)
+            return best, result
+
+        json_time, json_deck = timed(lambda: build_deck(typed, view_state, binary_min_points=float("inf")))
+        binary_time, binary_deck = timed(lambda: build_deck(typed, view_state, binary_min_points=0))
+        row = {
+            'points': n_points,
+            'json_kb': len(json_deck.to_json().encode("utf-8")) / 1024,
+            'json_ms': json_time * 1000,
+            'binary_kb': binary_deck.payload_bytes / 1024,
+            'binary_ms': binary_time * 1000,
+        }
+        if pa is not None:
+            def arrow_payload():
+                table = pa.Table.from_pandas(df[['lon', 'lat', 'intensity', 'location_name']], preserve_index=False)
+                sink = pa.BufferOutputStream()
+                with pa.ipc.new_stream(sink, table.schema) as writer:
+                    writer.write_table(table)
+                return sink.getvalue()
+            arrow_time, arrow_buffer = timed(arrow_payload)
+            row.update({'arrow_kb': arrow_buffer.size / 1024, 'arrow_ms': arrow_time * 1000})
+        rows.append(row)
+    return pd.DataFrame(rows).set_index('points').round(1)
+
+
+if __name__ == "__main__":
+    with pd.option_context('display.width', 120):
+        print(benchmark_transport())
@@ -0,0 +1,14 @@
+# Dicionário de cidades e suas coordenadas centrais e zoom padrão
+# (compartilhado entre o app e os jobs em lote)
+CITIES = {
+    "João Pessoa, PB": {"lat": -7.1197, "lon": -34.8450, "zoom": 12},
+    "Recife, PE": {"lat": -8.0476, "lon": -34.8769, "zoom": 11},
+    "Natal, RN": {"lat": -5.7950, "lon": -35.2110, "zoom": 11},
+    "São Paulo, SP": {"lat": -23.5505, "lon": -46.6333, "zoom": 10},
+    "Rio de Janeiro, RJ": {"lat": -22.9068, "lon": -43.1729, "zoom": 11},
+    "Brasília, DF": {"lat": -15.7797, "lon": -47.9297, "zoom": 10},
+    "Salvador, BA": {"lat": -12.9714, "lon": -38.5014, "zoom": 11},
+    "Curitiba, PR": {"lat": -25.4284, "lon": -49.2733, "zoom": 11},
+    "Sergipe, SE": {"lat": -10.9472, "lon": -37.0731, "zoom": 11},
+    "Lagarto, SE": {"lat": -10.9031, "lon": -37.6464, "zoom": 12},
+}
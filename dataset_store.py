@@ -0,0 +1,363 @@
+import datetime
+import glob
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import unicodedata
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+import simulation
+from event_index import HOURS_PER_DAY, _row_keys, concat_frames
+from insight_cache import CACHE_DIR
+from simulation import DEFAULT_SEED, type_names
+
+# --- Armazenamento Persistente dos Datasets ---
+# Cada dia de cada (cidade, seed) é gerado uma única vez e gravado como um arquivo Arrow IPC
+# sem compressão, com as linhas ordenadas por (tipo, hora). Os offsets (tipo, hora) e a
+# previsão de chuva do dia vão nos metadados do arquivo, então um filtro da sidebar vira uma
+# fatia do arquivo mapeado em memória: nada é lido além das linhas pedidas, e vários processos
+# (réplicas do Streamlit) compartilham as mesmas páginas via page cache. Como o gerador usa
+# uma semente por dia, mover ou ampliar o período só gera os dias que ainda não existem.
+STORE_DIR = os.getenv("GEOPREDICTOR_DATA_DIR", os.path.join(CACHE_DIR, "datasets"))
+STORE_VERSION = 2 # Mude quando o gerador ou o esquema mudarem, para invalidar os arquivos
+METADATA_KEY = b"geopredictor"
+DEFAULT_RETENTION_DAYS = int(os.getenv("GEOPREDICTOR_RETENTION_DAYS", "365"))
+DEFAULT_WINDOW_DAYS = 7
+
+
+def dataset_dir_name(city_name, seed):
+    ascii_name = unicodedata.normalize("NFKD", city_name).encode("ascii", "ignore").decode("ascii")
+    slug = re.sub(r"[^a-z0-9]+", "-", ascii_name.lower()).strip("-")
+    digest = hashlib.sha256(f"{STORE_VERSION}|{city_name}|{seed}".encode("utf-8")).hexdigest()[:12]
+    return f"{slug}_s{seed}_{digest}"
+
+
+def date_range(start_date, end_date):
+    return [start_date + datetime.timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+
+
+def default_window():
+    # Período exibido pelo app: WINDOW_DAYS dias terminando hoje (ou em GEOPREDICTOR_WINDOW_END)
+    days = int(os.getenv("GEOPREDICTOR_WINDOW_DAYS", str(DEFAULT_WINDOW_DAYS)))
+    end_date = datetime.date.fromisoformat(os.getenv("GEOPREDICTOR_WINDOW_END") or datetime.date.today().isoformat())
+    return end_date - datetime.timedelta(days=days - 1), end_date
+
+
+def write_days(df, path_for_date, metadata=None):
+    # Grava o DataFrame (compacto) como um arquivo por dia, com as linhas ordenadas por (tipo, hora);
+    # retorna {data: caminho}
+    days, hours, type_codes = _row_keys(df)
+    order = np.lexsort((hours, type_codes, days))
+    days, hours, type_codes = days[order], hours[order], type_codes[order]
+    table = pa.Table.from_pandas(df.take(order), preserve_index=False).combine_chunks()
+    rain = df['rain_forecast_mm'].to_numpy()[order]
+
+    day_values, day_starts = np.unique(days, return_index=True)
+    day_stops = np.append(day_starts[1:], len(days))
+    written = {}
+    for day, start, stop in zip(day_values, day_starts, day_stops):
+        date = day.astype(datetime.date)
+        cell_counts = np.bincount(type_codes[start:stop] * HOURS_PER_DAY + hours[start:stop], minlength=len(type_names) * HOURS_PER_DAY)
+        day_metadata = {
+            "version": STORE_VERSION,
+            "date": date.isoformat(),
+            "offsets": np.concatenate([[0], np.cumsum(cell_counts)]).tolist(),
+            "rain_forecast_mm": rain[start:stop].max().item(),
+            **(metadata or {}),
+        }
+        day_table = table.slice(start, stop - start)
+        day_table = day_table.replace_schema_metadata({
+            **(day_table.schema.metadata or {}),
+            METADATA_KEY: json.dumps(day_metadata).encode("utf-8"),
+        })
+        written[date] = _write_atomic(day_table, path_for_date(date))
+    return written
+
+
+def _write_atomic(table, path):
+    # Escrita atômica: outro processo nunca mapeia um arquivo pela metade
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp_path, path)
+    return path
+
+
+class StoredDay:
+    def __init__(self, path):
+        self.path = path
+        reader = pa.ipc.open_file(pa.memory_map(path, "r"))
+        metadata = json.loads(reader.schema.metadata[METADATA_KEY])
+        self.date = datetime.date.fromisoformat(metadata["date"])
+        self.offsets = np.asarray(metadata["offsets"])
+        self.rain_forecast_mm = metadata["rain_forecast_mm"]
+        self.batch = reader.get_batch(0)
+        # Colunas dictionary: a categoria é montada uma vez e cada fatia só converte os índices
+        self.dtypes = {
+            field.name: pd.CategoricalDtype(self.batch.column(field.name).dictionary.to_pylist())
+            for field in reader.schema if pa.types.is_dictionary(field.type)
+        }
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def to_frame(self, start=0, stop=None):
+        batch = self.batch.slice(start, (len(self) if stop is None else stop) - start)
+        columns = {}
+        for name, column in zip(batch.schema.names, batch.columns):
+            if name in self.dtypes:
+                columns[name] = pd.Categorical.from_codes(column.indices.to_numpy(zero_copy_only=False), dtype=self.dtypes[name])
+            else:
+                columns[name] = column.to_numpy(zero_copy_only=False)
+        return pd.DataFrame(columns, copy=False)
+
+    def select(self, type_name, hour_start, hour_end):
+        base = type_names.index(type_name) * HOURS_PER_DAY
+        return self.to_frame(self.offsets[base + hour_start], self.offsets[base + hour_end + 1])
+
+
+class StoredDataset:
+    # Mesma interface de consulta do EventIndex (dates, day_frame, rain_forecast, query_typed,
+    # query, drop_days), lendo de arquivos Arrow IPC diários mapeados em memória. Cada arquivo
+    # só é aberto na primeira consulta ao seu dia.
+    def __init__(self, paths=None):
+        self.paths = {}
+        self._days = {}
+        self._empty_frame = None
+        self.add_files(paths or {})
+
+    def __len__(self):
+        return sum(len(self._day(date)) for date in self.paths)
+
+    @property
+    def dates(self):
+        return sorted(self.paths)
+
+    @property
+    def nbytes(self):
+        return sum(os.path.getsize(path) for path in self.paths.values())
+
+    def add_files(self, paths):
+        # paths: {data: caminho do arquivo do dia}
+        for date, path in paths.items():
+            self.paths[date] = path
+            self._days.pop(date, None)
+
+    def drop_days(self, dates):
+        for date in dates:
+            self.paths.pop(date, None)
+            self._days.pop(date, None)
+
+    def updated(self, paths=None, dropped=()):
+        # Nova visão com os dias adicionados e removidos, sem alterar esta (que pode estar sendo
+        # lida por outra sessão); os dias já abertos e mantidos são reaproveitados
+        dropped = set(dropped)
+        dataset = StoredDataset({date: path for date, path in self.paths.items() if date not in dropped})
+        opened = dict(self._days)
+        dataset._days = {date: day for date, day in opened.items() if date in dataset.paths}
+        dataset.add_files(paths or {})
+        return dataset
+
+    def _day(self, date):
+        path = self.paths.get(date)
+        if path is None:
+            return None
+        day = self._days.get(date)
+        if day is None:
+            day = self._days[date] = StoredDay(path)
+        return day
+
+    def day_frame(self, date):
+        day = self._day(date)
+        return day.to_frame() if day is not None else self._empty()
+
+    def rain_forecast(self, date):
+        day = self._day(date)
+        return day.rain_forecast_mm if day is not None else 0
+
+    def query_typed(self, date, hour_range, types):
+        # Fatias sem cópia do arquivo do dia; só as linhas retornadas viram DataFrame
+        day = self._day(date)
+        hour_start, hour_end = max(hour_range[0], 0), min(hour_range[1], HOURS_PER_DAY - 1)
+        result = {}
+        for type_name in types:
+            if day is None or hour_start > hour_end:
+                result[type_name] = self._empty()
+            else:
+                result[type_name] = day.select(type_name, hour_start, hour_end)
+        return result
+
+    def query(self, date, hour_range, types):
+        slices = [s for s in self.query_typed(date, hour_range, types).values() if not s.empty]
+        if not slices:
+            return self._empty()
+        return pd.concat(slices, ignore_index=True)
+
+    def to_frame(self):
+        frames = [self._day(date).to_frame() for date in self.dates]
+        return concat_frames(frames) if frames else self._empty()
+
+    def _empty(self):
+        if self._empty_frame is None and self.paths:
+            self._empty_frame = self._day(self.dates[0]).to_frame(0, 0)
+        return self._empty_frame.copy() if self._empty_frame is not None else pd.DataFrame()
+
+
+class DayFileWriter:
+    # Destino da ingestão (ingestion.ingest(source, index=writer)): cada flush vai direto para
+    # arquivos diários no formato do StoredDataset, sem acumular o feed em memória; as consultas
+    # usam writer.dataset. Um dia que aparece em mais de um flush é regravado com as linhas já
+    # gravadas mais as novas, o que num feed em ordem cronológica só acontece nos dias da
+    # fronteira entre dois flushes. O diretório é esvaziado antes da primeira gravação.
+    def __init__(self, directory, metadata=None):
+        shutil.rmtree(directory, ignore_errors=True)
+        self.directory = directory
+        self.metadata = metadata
+        self.dataset = StoredDataset()
+
+    def __len__(self):
+        return len(self.dataset)
+
+    @property
+    def dates(self):
+        return self.dataset.dates
+
+    def day_path(self, date):
+        return os.path.join(self.directory, f"{date.isoformat()}.arrow")
+
+    def add(self, df):
+        if df.empty:
+            return
+        days = np.unique(df['timestamp'].values.astype('datetime64[D]')).astype(datetime.date)
+        stored = [self.dataset.day_frame(date) for date in days if date in self.dataset.paths]
+        if stored:
+            df = concat_frames([df, *stored])
+        self.dataset = self.dataset.updated(write_days(df, self.day_path, self.metadata))
+
+
+class DatasetStore:
+    def __init__(self, root=None):
+        self.root = root or STORE_DIR
+
+    def city_dir(self, city_name, seed=DEFAULT_SEED):
+        return os.path.join(self.root, dataset_dir_name(city_name, seed))
+
+    def day_path(self, city_name, date, seed=DEFAULT_SEED):
+        return os.path.join(self.city_dir(city_name, seed), f"{date.isoformat()}.arrow")
+
+    def stored_dates(self, city_name, seed=DEFAULT_SEED):
+        paths = glob.glob(os.path.join(self.city_dir(city_name, seed), "*.arrow"))
+        return sorted(datetime.date.fromisoformat(os.path.basename(path)[:-len(".arrow")]) for path in paths)
+
+    def ensure_days(self, city_lat, city_lon, city_name, dates, seed=DEFAULT_SEED):
+        # Gera, numa única chamada vetorizada, só os dias ainda não gravados; retorna {data: caminho}
+        paths = {date: self.day_path(city_name, date, seed) for date in dates}
+        missing = [date for date, path in paths.items() if not os.path.exists(path)]
+        if missing:
+            df = simulation.generate_simulated_days(city_lat, city_lon, city_name, missing, seed=seed, compact=True)
+            write_days(df, lambda date: paths[date], metadata={"city": city_name, "seed": seed})
+        return paths
+
+    def open(self, city_lat, city_lon, city_name, start_date, end_date, seed=DEFAULT_SEED):
+        # Gera e grava na primeira vez; nas seguintes (e em outros processos) só mapeia os arquivos
+        return StoredDataset(self.ensure_days(city_lat, city_lon, city_name, date_range(start_date, end_date), seed))
+
+    def evict(self, city_name, keep_from, seed=DEFAULT_SEED):
+        # Remove do disco os dias anteriores a keep_from; retorna as datas removidas
+        removed = []
+        for date in self.stored_dates(city_name, seed):
+            if date < keep_from:
+                os.remove(self.day_path(city_name, date, seed))
+                removed.append(date)
+        return removed
+
+    def feed_dir(self, feed_path, modified_at):
+        # Um diretório por arquivo de feed, versão do arquivo (mtime) e processo, para que réplicas
+        # do app não regravem os arquivos umas das outras
+        digest = hashlib.sha256(f"{STORE_VERSION}|{os.path.abspath(feed_path)}".encode("utf-8")).hexdigest()[:12]
+        return os.path.join(self.root, "feeds", digest, f"{int(modified_at * 1e6)}_{os.getpid()}")
+
+    def evict_feeds(self, keep_dir):
+        # Apaga as outras versões do mesmo feed gravadas por este processo ou por processos que já
+        # terminaram; as de réplicas ainda vivas ficam, pois podem estar sendo consultadas
+        for directory in glob.glob(os.path.join(os.path.dirname(keep_dir), "*_*")):
+            pid = os.path.basename(directory).rpartition("_")[2]
+            if directory == keep_dir or not pid.isdigit():
+                continue
+            if int(pid) == os.getpid() or not _process_alive(int(pid)):
+                shutil.rmtree(directory, ignore_errors=True)
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError: # Existe, mas é de outro usuário
+        pass
+    return True
+
+
+class RollingWindow:
+    # Janela deslizante de dias de uma cidade: update(start, end) gera só os dias que faltam,
+    # tira da visão os que saíram do período e apaga do disco os que passaram da retenção
+    # (retention_days contados a partir de end). Pode ser compartilhada entre sessões: cada
+    # update monta um StoredDataset novo e só então troca a referência em self.dataset, então
+    # quem já leu window.dataset continua consultando uma visão consistente, sem lock.
+    def __init__(self, store, city_lat, city_lon, city_name, seed=DEFAULT_SEED, retention_days=DEFAULT_RETENTION_DAYS):
+        self.store = store
+        self.city_lat = city_lat
+        self.city_lon = city_lon
+        self.city_name = city_name
+        self.seed = seed
+        self.retention_days = retention_days
+        self.dataset = StoredDataset()
+        self._lock = threading.Lock()
+
+    def update(self, start_date, end_date):
+        # Retorna (dias adicionados à visão, dias removidos da visão, dias apagados do disco)
+        with self._lock:
+            wanted = set(date_range(start_date, end_date))
+            current = set(self.dataset.dates)
+            added = sorted(wanted - current)
+            dropped = sorted(current - wanted)
+            if added or dropped:
+                paths = self.store.ensure_days(self.city_lat, self.city_lon, self.city_name, added, self.seed) if added else {}
+                self.dataset = self.dataset.updated(paths, dropped)
+            keep_from = end_date - datetime.timedelta(days=self.retention_days - 1)
+            evicted = self.store.evict(self.city_name, min(keep_from, start_date), self.seed)
+            return added, dropped, evicted
+
+
+if __name__ == "__main__":
+    # Compara a geração a frio de um ano com a abertura já persistida e com o avanço de um dia
+    import tempfile
+    import time
+
+    store = DatasetStore(tempfile.mkdtemp())
+    city = (-7.1197, -34.8450, "João Pessoa, PB")
+    start_date, end_date = datetime.date(2025, 1, 1), datetime.date(2025, 12, 31)
+
+    window = RollingWindow(store, *city)
+    start = time.perf_counter()
+    window.update(start_date, end_date)
+    cold = time.perf_counter() - start
+    start = time.perf_counter()
+    dataset = store.open(*city, start_date, end_date)
+    warm = time.perf_counter() - start
+    print(f"{len(dataset)} linhas em {len(dataset.dates)} arquivos diários, {dataset.nbytes / 1024**2:.1f} MB em disco")
+    start = time.perf_counter()
+    dataset.query_typed(datetime.date(2025, 6, 10), (7, 9), type_names)
+    query = time.perf_counter() - start
+    start = time.perf_counter()
+    added, dropped, _ = window.update(start_date + datetime.timedelta(days=1), end_date + datetime.timedelta(days=1))
+    slide = time.perf_counter() - start
+    print(f"a frio: {cold * 1000:.0f} ms | já persistido: {warm * 1000:.1f} ms | "
+          f"avançar 1 dia (+{len(added)}/-{len(dropped)}): {slide * 1000:.1f} ms | consulta 7h-9h: {query * 1000:.2f} ms")
@@ -0,0 +1,134 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from simulation import TYPE_DTYPE, type_names
+
+HOURS_PER_DAY = 24
+
+
+# --- Índice Temporal Particionado por Dia ---
+# Cada dia guarda suas linhas ordenadas por (tipo, hora) e um vetor de offsets com
+# len(type_names) * 24 + 1 posições: as linhas de (tipo t, hora h) ficam em
+# offsets[t * 24 + h]:offsets[t * 24 + h + 1]. Para um dia e um tipo, qualquer faixa de
+# horas é contígua, então um filtro vira uma fatia por tipo ativo.
+def _row_keys(df):
+    timestamps = df['timestamp'].values
+    days = timestamps.astype('datetime64[D]')
+    hours = ((timestamps - days) // np.timedelta64(1, 'h')).astype(np.int64)
+    type_codes = _type_codes(df['type'])
+    return days, hours, type_codes
+
+
+def _type_codes(types):
+    codes = np.asarray(types.astype(TYPE_DTYPE).cat.codes, dtype=np.int64)
+    if (codes < 0).any():
+        unknown = sorted(set(types[codes < 0].astype(str)))
+        raise ValueError(f"Tipos de ocorrência desconhecidos: {unknown}. Esperado um de {type_names}.")
+    return codes
+
+
+def concat_frames(frames):
+    # pd.concat degrada categóricos com categorias diferentes para object; unifica antes
+    frames = list(frames)
+    for column in frames[0].columns:
+        if all(isinstance(f[column].dtype, pd.CategoricalDtype) for f in frames):
+            categories = pd.api.types.union_categoricals([f[column] for f in frames]).categories
+            frames = [f.assign(**{column: f[column].cat.set_categories(categories)}) for f in frames]
+    return pd.concat(frames, ignore_index=True)
+
+
+class DayPartition:
+    def __init__(self, frame, hours, type_codes):
+        order = np.lexsort((hours, type_codes))
+        self.frame = frame.take(order).reset_index(drop=True)
+        counts = np.bincount(type_codes * HOURS_PER_DAY + hours, minlength=len(type_names) * HOURS_PER_DAY)
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+        # Previsão de chuva do dia, guardada na construção para não ler o frame a cada consulta
+        self.rain_forecast_mm = self.frame['rain_forecast_mm'].max() if 'rain_forecast_mm' in self.frame and len(self.frame) else 0
+
+    def __len__(self):
+        return len(self.frame)
+
+    def slice_bounds(self, type_name, hour_start, hour_end):
+        base = type_names.index(type_name) * HOURS_PER_DAY
+        return self.offsets[base + hour_start], self.offsets[base + hour_end + 1]
+
+    def select(self, type_name, hour_start, hour_end):
+        start, stop = self.slice_bounds(type_name, hour_start, hour_end)
+        return self.frame.iloc[start:stop]
+
+
+class EventIndex:
+    def __init__(self, df=None):
+        self.partitions = {}
+        self._columns = None
+        if df is not None:
+            self.add(df)
+
+    def __len__(self):
+        return sum(len(p) for p in self.partitions.values())
+
+    @property
+    def dates(self):
+        return sorted(self.partitions)
+
+    def add(self, df):
+        # Insere linhas novas; apenas os dias tocados são reordenados
+        if df.empty:
+            return
+        if self._columns is None:
+            self._columns = df.iloc[:0]
+        days, hours, type_codes = _row_keys(df)
+        order = np.argsort(days, kind='stable')
+        sorted_days = days[order]
+        day_values, day_starts = np.unique(sorted_days, return_index=True)
+        day_stops = np.append(day_starts[1:], len(order))
+        for day, start, stop in zip(day_values, day_starts, day_stops):
+            rows = order[start:stop]
+            date = day.astype(datetime.date)
+            new_frame = df.take(rows)
+            new_hours, new_types = hours[rows], type_codes[rows]
+            existing = self.partitions.get(date)
+            if existing is not None:
+                _, old_hours, old_types = _row_keys(existing.frame)
+                new_frame = concat_frames([existing.frame, new_frame])
+                new_hours = np.concatenate([old_hours, new_hours])
+                new_types = np.concatenate([old_types, new_types])
+            self.partitions[date] = DayPartition(new_frame, new_hours, new_types)
+
+    def drop_days(self, dates):
+        for date in dates:
+            self.partitions.pop(date, None)
+
+    def day_frame(self, date):
+        partition = self.partitions.get(date)
+        return partition.frame if partition is not None else self._empty()
+
+    def rain_forecast(self, date):
+        partition = self.partitions.get(date)
+        return partition.rain_forecast_mm if partition is not None else 0
+
+    def query_typed(self, date, hour_range, types):
+        # Retorna {tipo: fatia} para os tipos pedidos; custo proporcional às linhas retornadas
+        partition = self.partitions.get(date)
+        hour_start, hour_end = max(hour_range[0], 0), min(hour_range[1], HOURS_PER_DAY - 1)
+        result = {}
+        for type_name in types:
+            if partition is None or hour_start > hour_end:
+                result[type_name] = self._empty()
+            else:
+                result[type_name] = partition.select(type_name, hour_start, hour_end)
+        return result
+
+    def query(self, date, hour_range, types):
+        slices = [s for s in self.query_typed(date, hour_range, types).values() if not s.empty]
+        if not slices:
+            return self._empty()
+        return pd.concat(slices, ignore_index=True)
+
+    def _empty(self):
+        if self._columns is None:
+            return pd.DataFrame()
+        return self._columns.copy()
@@ -0,0 +1,177 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from event_index import HOURS_PER_DAY, concat_frames
+from simulation import TYPE_DTYPE, type_names
+
+# --- Previsão Local das Próximas Horas (Nowcasting) ---
+# Perfil sazonal por (local, tipo) e hora da semana, ajustado no histórico já em cache, mais
+# um efeito linear da chuva por tipo. Com poucas semanas de histórico cada hora da semana tem
+# poucas observações, então o perfil semanal é puxado para o perfil por hora do dia, e este
+# para a média do local (PRIOR_WEIGHT observações "virtuais" em cada nível). O ajuste é um
+# punhado de bincounts sobre o histórico inteiro e a previsão de todos os locais para as
+# próximas horas é uma indexação da matriz de perfis: milissegundos, sem chamar o modelo de IA.
+HOURS_PER_WEEK = 7 * HOURS_PER_DAY
+DEFAULT_HORIZON_HOURS = 3
+PRIOR_WEIGHT = 2.0
+
+
+class NowcastModel:
+    def __init__(self, series, weekly_profile, rain_slope):
+        # series: um registro por (local, tipo) com location_name, type, lat e lon médios
+        # weekly_profile: (séries, 168) intensidade esperada sem chuva por hora da semana
+        # rain_slope: (tipos,) variação da intensidade por mm de chuva prevista
+        self.series = series
+        self.weekly_profile = weekly_profile
+        self.rain_slope = rain_slope
+
+    def __len__(self):
+        return len(self.series)
+
+    def predict(self, start, hours=DEFAULT_HORIZON_HOURS, rain_forecast_mm=0):
+        # Intensidade prevista de cada (local, tipo) nas horas start+1 ... start+hours;
+        # uma linha por (hora à frente, série), no esquema dos eventos mais hour_ahead
+        start = pd.Timestamp(start).floor("h")
+        timestamps = start + pd.to_timedelta(np.arange(1, hours + 1), unit="h")
+        hour_of_week = (timestamps.dayofweek * HOURS_PER_DAY + timestamps.hour).to_numpy()
+        type_codes = self.series['type'].cat.codes.to_numpy()
+        intensity = self.weekly_profile[:, hour_of_week].T + self.rain_slope[type_codes] * rain_forecast_mm
+        n_series = len(self.series)
+        return pd.DataFrame({
+            'lat': np.tile(self.series['lat'].to_numpy(), hours),
+            'lon': np.tile(self.series['lon'].to_numpy(), hours),
+            'intensity': np.clip(intensity.ravel(), 0, 10).astype(np.float32),
+            'type': pd.Categorical.from_codes(np.tile(type_codes, hours), dtype=TYPE_DTYPE),
+            'location_name': pd.Categorical.from_codes(np.tile(self.series['location_name'].cat.codes.to_numpy(), hours), dtype=self.series['location_name'].dtype),
+            'timestamp': np.repeat(timestamps.to_numpy(), n_series),
+            'hour_ahead': np.repeat(np.arange(1, hours + 1, dtype=np.int8), n_series),
+            'rain_forecast_mm': np.full(n_series * hours, rain_forecast_mm, dtype=np.int16),
+        })
+
+
+def history_frame(event_index, dates=None):
+    # Histórico para o ajuste: os dias pedidos (padrão: todos) de um EventIndex ou StoredDataset
+    dates = event_index.dates if dates is None else dates
+    frames = [frame for frame in (event_index.day_frame(date) for date in dates) if not frame.empty]
+    return concat_frames(frames) if frames else None
+
+
+def _shrunk_mean(sums, counts, prior, weight):
+    return (sums + weight * prior) / (counts + weight)
+
+
+def fit_nowcast(history, prior_weight=PRIOR_WEIGHT):
+    # history: ocorrências de qualquer período (compactas ou não); None se não houver dados
+    if history is None or history.empty:
+        return None
+    type_codes = np.asarray(history['type'].astype(TYPE_DTYPE).cat.codes, dtype=np.int64)
+    location_codes, location_names = pd.factorize(history['location_name'])
+    series_ids, series_keys = pd.factorize(location_codes * len(type_names) + type_codes)
+    n_series = len(series_keys)
+    timestamps = history['timestamp']
+    hour = timestamps.dt.hour.to_numpy(dtype=np.int64)
+    hour_of_week = timestamps.dt.dayofweek.to_numpy(dtype=np.int64) * HOURS_PER_DAY + hour
+    intensity = history['intensity'].to_numpy(dtype=np.float64)
+    rain = history['rain_forecast_mm'].to_numpy(dtype=np.float64)
+
+    def cell_means(cell, n_cells, values):
+        counts = np.bincount(cell, minlength=n_cells)
+        return np.bincount(cell, weights=values, minlength=n_cells) / np.maximum(counts, 1)
+
+    # Efeito da chuva: regressão por tipo dos desvios em relação à média da (série, hora do dia),
+    # para que a sazonalidade diária não seja confundida com a chuva
+    daily_cell = series_ids * HOURS_PER_DAY + hour
+    n_daily = n_series * HOURS_PER_DAY
+    intensity_dev = intensity - cell_means(daily_cell, n_daily, intensity)[daily_cell]
+    rain_dev = rain - cell_means(daily_cell, n_daily, rain)[daily_cell]
+    covariance = np.bincount(type_codes, weights=intensity_dev * rain_dev, minlength=len(type_names))
+    variance = np.bincount(type_codes, weights=rain_dev * rain_dev, minlength=len(type_names))
+    rain_slope = np.divide(covariance, variance, out=np.zeros(len(type_names)), where=variance > 0)
+
+    # Perfis sem chuva: média da série -> hora do dia -> hora da semana, cada nível encolhido para o anterior
+    dry = intensity - rain_slope[type_codes] * rain
+    series_count = np.bincount(series_ids, minlength=n_series)
+    series_mean = np.bincount(series_ids, weights=dry, minlength=n_series) / series_count
+    daily_profile = _shrunk_mean(
+        np.bincount(daily_cell, weights=dry, minlength=n_daily).reshape(n_series, HOURS_PER_DAY),
+        np.bincount(daily_cell, minlength=n_daily).reshape(n_series, HOURS_PER_DAY),
+        series_mean[:, None], prior_weight,
+    )
+    weekly_cell = series_ids * HOURS_PER_WEEK + hour_of_week
+    n_weekly = n_series * HOURS_PER_WEEK
+    weekly_profile = _shrunk_mean(
+        np.bincount(weekly_cell, weights=dry, minlength=n_weekly).reshape(n_series, HOURS_PER_WEEK),
+        np.bincount(weekly_cell, minlength=n_weekly).reshape(n_series, HOURS_PER_WEEK),
+        np.tile(daily_profile, 7), prior_weight,
+    )
+
+    series = pd.DataFrame({
+        'location_name': pd.Categorical.from_codes(series_keys // len(type_names), categories=pd.Index(location_names).astype(str)),
+        'type': pd.Categorical.from_codes(series_keys % len(type_names), dtype=TYPE_DTYPE),
+        'lat': np.bincount(series_ids, weights=history['lat'].to_numpy(dtype=np.float64), minlength=n_series) / series_count,
+        'lon': np.bincount(series_ids, weights=history['lon'].to_numpy(dtype=np.float64), minlength=n_series) / series_count,
+    })
+    return NowcastModel(series, weekly_profile, rain_slope)
+
+
+def forecast_peaks(forecast):
+    # Pico previsto de cada (local, tipo) no horizonte, com a hora em que ocorre; usado no mapa
+    if forecast.empty:
+        return forecast.iloc[:0]
+    ordered = forecast.sort_values('intensity', ascending=False, kind='stable')
+    return ordered.drop_duplicates(['type', 'location_name']).reset_index(drop=True)
+
+
+def forecast_lines(forecast, top_n=3):
+    # Contexto estruturado para o prompt: por tipo, média prevista por hora e os locais com maior pico
+    lines = []
+    if forecast.empty:
+        return lines
+    peaks = forecast_peaks(forecast)
+    hourly = forecast.groupby(['type', 'timestamp'], observed=True)['intensity'].mean()
+    for type_name in forecast['type'].cat.categories:
+        if type_name not in hourly.index.get_level_values('type'):
+            continue
+        by_hour = ", ".join(f"{timestamp:%H}h {value:.1f}" for timestamp, value in hourly.loc[type_name].items())
+        top = peaks[peaks['type'] == type_name].nlargest(top_n, 'intensity')
+        top_labels = ", ".join(f"{row.location_name} ({row.intensity:.1f} às {row.timestamp:%H}h)" for row in top.itertuples())
+        lines.append(
+            f"- Tipo: {type_name}\n"
+            f"  Intensidade Média Prevista por Hora: {by_hour}\n"
+            f"  Maiores Picos Previstos: {top_labels}\n"
+        )
+    return lines
+
+
+if __name__ == "__main__":
+    # Ajusta e prevê para todas as cidades a partir de um mês de histórico, medindo o tempo
+    # e o erro contra o dia seguinte (fora do ajuste) frente a repetir o valor da véspera
+    import time
+
+    import simulation
+    from cities import CITIES
+
+    fit_seconds, predict_seconds, model_errors, naive_errors = 0.0, 0.0, [], []
+    history_start, history_end = datetime.date(2025, 5, 10), datetime.date(2025, 6, 9)
+    for city_name, city in CITIES.items():
+        data = simulation.generate_simulated_data(city["lat"], city["lon"], city_name, history_start, history_end + datetime.timedelta(days=1), compact=True)
+        is_history = data['timestamp'] < pd.Timestamp(history_end + datetime.timedelta(days=1))
+        history, actual = data[is_history], data[~is_history]
+        start = time.perf_counter()
+        model = fit_nowcast(history)
+        fit_seconds += time.perf_counter() - start
+        start = time.perf_counter()
+        forecast = model.predict(pd.Timestamp(history_end), hours=HOURS_PER_DAY, rain_forecast_mm=int(actual['rain_forecast_mm'].max()))
+        predict_seconds += time.perf_counter() - start
+
+        keys = ['type', 'location_name', 'timestamp']
+        actual_hourly = actual.assign(timestamp=actual['timestamp'].dt.floor("h")).groupby(keys, observed=True)['intensity'].mean()
+        previous = history[history['timestamp'] >= pd.Timestamp(history_end)]
+        previous_hourly = previous.assign(timestamp=previous['timestamp'].dt.floor("h") + pd.Timedelta(days=1)).groupby(keys, observed=True)['intensity'].mean()
+        predicted = forecast.set_index(keys)['intensity']
+        model_errors.append((predicted.reindex(actual_hourly.index) - actual_hourly).abs().mean())
+        naive_errors.append((previous_hourly.reindex(actual_hourly.index) - actual_hourly).abs().mean())
+    print(f"{len(CITIES)} cidades: ajuste {fit_seconds * 1000:.0f} ms, previsão de 24h {predict_seconds * 1000:.1f} ms no total")
+    print(f"erro absoluto médio no dia seguinte: modelo {np.mean(model_errors):.2f} | véspera {np.nanmean(naive_errors):.2f}")
@@ -0,0 +1,443 @@
+import argparse
+import csv
+import io
+import json
+import os
+import queue
+import time
+import tracemalloc
+import warnings
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from event_index import EventIndex, concat_frames
+from simulation import TYPE_DTYPE, type_names
+
+# --- Ingestão de Feeds Reais ---
+# Fontes (CSV, Parquet, JSONL ou uma fila local no lugar de um broker) entregam o feed em
+# blocos de tamanho limitado; cada bloco é validado e normalizado para o esquema compacto do
+# simulador (simulation.generate_simulated_data(compact=True)) e acumulado até flush_rows
+# linhas antes de entrar no índice, para que cada dia seja reordenado poucas vezes. O índice
+# pode ser um EventIndex em memória ou um dataset_store.DayFileWriter, que grava cada flush em
+# arquivos diários mapeados em memória. O arquivo nunca é carregado inteiro em memória.
+DEFAULT_CHUNK_ROWS = 100_000
+DEFAULT_FLUSH_ROWS = 1_000_000
+READ_BLOCK_BYTES = 4 << 20
+FEED_TIMEZONE = "America/Sao_Paulo" # Timestamps com fuso são convertidos para o horário local
+# Texto de timestamp com fuso depois da hora ("08:00:00Z", "08:00-03:00", "08:00:00 -03")
+OFFSET_SUFFIX = r'\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?\s*(?:Z|[+-]\d{2}(?::?\d{2})?)$'
+
+# Nomes alternativos de colunas e de tipos aceitos nos feeds
+COLUMN_ALIASES = {
+    "ts": "timestamp", "time": "timestamp", "datetime": "timestamp", "event_time": "timestamp",
+    "latitude": "lat", "longitude": "lon", "lng": "lon",
+    "event_type": "type", "category": "type",
+    "value": "intensity", "level": "intensity",
+    "location": "location_name", "sensor": "location_name", "sensor_id": "location_name",
+    "rain_mm": "rain_forecast_mm", "rainfall_mm": "rain_forecast_mm",
+}
+TYPE_ALIASES = {
+    "traffic": 'Tráfego Intenso', "trafego": 'Tráfego Intenso',
+    "crowd": 'Concentração Turística', "tourism": 'Concentração Turística', "turismo": 'Concentração Turística',
+    "flood": 'Risco de Alagamento', "rain": 'Risco de Alagamento', "rainfall": 'Risco de Alagamento', "alagamento": 'Risco de Alagamento',
+    **{name.lower(): name for name in type_names},
+}
+REQUIRED_COLUMNS = ['timestamp', 'lat', 'lon', 'type', 'intensity']
+NUMERIC_COLUMNS = ['lat', 'lon', 'intensity', 'rain_forecast_mm']
+TEXT_COLUMNS = ['timestamp', 'type', 'location_name'] # Viram categóricas: poucos valores distintos
+DEFAULT_LOCATION_NAME = "Sensor"
+
+
+# --- Fontes ---
+# Cada fonte é um iterável de DataFrames crus com no máximo chunk_rows linhas. As colunas do
+# feed chegam como texto (CSV) ou com o tipo declarado antes da leitura (JSONL), nunca
+# inferido de um bloco: uma linha inválida depois do primeiro bloco seria um ArrowInvalid que
+# derruba o feed inteiro, e normalize_events já converte e descarta os valores inválidos.
+def canonical_column(name):
+    name = str(name).strip().lower()
+    return COLUMN_ALIASES.get(name, name)
+
+
+def _to_frame(table):
+    # Colunas do feed lidas como texto são convertidas no Arrow quando o bloco inteiro converte
+    # (números e timestamps ISO sem fuso); senão ficam como texto, e normalize_events converte
+    # o que der e descarta as linhas inválidas. O texto restante de timestamps, tipos e sensores
+    # vira categórico (poucos valores distintos)
+    target_types = {'timestamp': pa.timestamp('ns'), **{name: pa.float64() for name in NUMERIC_COLUMNS}}
+    for i, name in enumerate(table.column_names):
+        column = table.column(i)
+        target = target_types.get(canonical_column(name))
+        if target is not None and pa.types.is_string(column.type):
+            try:
+                table = table.set_column(i, name, column.cast(target))
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                pass
+    categories = [field.name for field in table.schema if canonical_column(field.name) in TEXT_COLUMNS and pa.types.is_string(field.type)]
+    return table.to_pandas(categories=categories)
+
+
+def _rechunk(batches, chunk_rows):
+    # Reagrupa os RecordBatches do leitor do Arrow em DataFrames de chunk_rows linhas
+    buffered, buffered_rows = [], 0
+    for batch in batches:
+        buffered.append(batch)
+        buffered_rows += batch.num_rows
+        while buffered_rows >= chunk_rows:
+            table = pa.Table.from_batches(buffered)
+            yield _to_frame(table.slice(0, chunk_rows))
+            rest = table.slice(chunk_rows)
+            buffered, buffered_rows = rest.to_batches(), rest.num_rows
+    if buffered_rows:
+        yield _to_frame(pa.Table.from_batches(buffered))
+
+
+class CsvSource:
+    def __init__(self, path, chunk_rows=DEFAULT_CHUNK_ROWS):
+        self.path = path
+        self.chunk_rows = chunk_rows
+
+    def __iter__(self):
+        # Leitor em streaming do pyarrow, com todas as colunas do cabeçalho declaradas como texto
+        from pyarrow import csv as arrow_csv
+
+        with open(self.path, newline="", encoding="utf-8-sig") as file:
+            header = next(csv.reader(file), [])
+        # Células vazias ou "NA"/"NaN"/"null" viram nulos, como no leitor padrão
+        convert_options = arrow_csv.ConvertOptions(column_types={name: pa.string() for name in header}, strings_can_be_null=True)
+        reader = arrow_csv.open_csv(self.path, read_options=arrow_csv.ReadOptions(block_size=READ_BLOCK_BYTES), convert_options=convert_options)
+        yield from _rechunk(reader, self.chunk_rows)
+
+
+class ParquetSource:
+    def __init__(self, path, chunk_rows=DEFAULT_CHUNK_ROWS):
+        self.path = path
+        self.chunk_rows = chunk_rows
+
+    def __iter__(self):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(self.path).iter_batches(batch_size=self.chunk_rows):
+            yield batch.to_pandas()
+
+
+class JsonlSource:
+    # O leitor de JSON do pyarrow não converte número em texto (nem o contrário) numa coluna de
+    # tipo declarado, então o arquivo é lido em blocos de linhas inteiras: cada bloco é lido com
+    # o esquema da primeira linha (colunas numéricas do feed em float64, as demais como texto)
+    # e, se tiver um valor fora do tipo, é relido linha a linha e convertido para o esquema.
+    def __init__(self, path, chunk_rows=DEFAULT_CHUNK_ROWS):
+        self.path = path
+        self.chunk_rows = chunk_rows
+
+    def __iter__(self):
+        with open(self.path, "rb") as file:
+            first_line = file.readline()
+            file.seek(0)
+            if not first_line.strip():
+                return
+            names = list(json.loads(first_line))
+            schema = pa.schema([
+                (name, pa.float64() if canonical_column(name) in NUMERIC_COLUMNS else pa.string()) for name in names
+            ])
+            yield from _rechunk(self._batches(file, schema), self.chunk_rows)
+
+    def _batches(self, file, schema):
+        from pyarrow import json as arrow_json
+
+        parse_options = arrow_json.ParseOptions(explicit_schema=schema, unexpected_field_behavior="ignore")
+        while True:
+            block = file.read(READ_BLOCK_BYTES)
+            if not block:
+                break
+            block += file.readline() # Completa a última linha do bloco
+            try:
+                table = arrow_json.read_json(io.BytesIO(block), parse_options=parse_options)
+            except pa.ArrowInvalid:
+                table = _records_table(block.splitlines(), schema)
+            yield from table.to_batches()
+
+
+def _records_table(lines, schema):
+    # Linhas JSON lidas uma a uma e convertidas para o esquema; valor que não converte ou linha
+    # que não é JSON viram nulos
+    columns = {field.name: [] for field in schema}
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = {}
+        if not isinstance(record, dict):
+            record = {}
+        for field in schema:
+            value = record.get(field.name)
+            if value is not None and pa.types.is_floating(field.type):
+                try:
+                    value = float(value)
+                except (TypeError, ValueError):
+                    value = None
+            elif value is not None:
+                value = str(value)
+            columns[field.name].append(value)
+    return pa.table(columns, schema=schema)
+
+
+class QueueSource:
+    # Consome eventos (dicts) de uma queue.Queue, no lugar de um broker de mensagens; None
+    # encerra o feed. Entrega um bloco ao juntar chunk_rows eventos ou após idle_seconds sem eventos.
+    def __init__(self, events, chunk_rows=DEFAULT_CHUNK_ROWS, idle_seconds=1.0):
+        self.events = events
+        self.chunk_rows = chunk_rows
+        self.idle_seconds = idle_seconds
+
+    def __iter__(self):
+        pending = []
+        while True:
+            try:
+                event = self.events.get(timeout=self.idle_seconds)
+            except queue.Empty:
+                if pending:
+                    yield pd.DataFrame(pending)
+                    pending = []
+                continue
+            if event is None:
+                break
+            pending.append(event)
+            if len(pending) >= self.chunk_rows:
+                yield pd.DataFrame(pending)
+                pending = []
+        if pending:
+            yield pd.DataFrame(pending)
+
+
+def open_source(path, chunk_rows=DEFAULT_CHUNK_ROWS):
+    extension = os.path.splitext(path)[1].lower()
+    sources = {".csv": CsvSource, ".parquet": ParquetSource, ".jsonl": JsonlSource, ".ndjson": JsonlSource}
+    if extension not in sources:
+        raise ValueError(f"Formato de feed não suportado: {extension!r}. Use um de {sorted(sources)}.")
+    return sources[extension](path, chunk_rows)
+
+
+# --- Validação e Normalização ---
+def _parse_timestamp(value):
+    try:
+        timestamp = pd.Timestamp(value)
+    except (ValueError, TypeError, OverflowError):
+        return pd.NaT
+    if timestamp is not pd.NaT and timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_convert(FEED_TIMEZONE).tz_localize(None)
+    return timestamp
+
+
+def parse_timestamps(values):
+    # Timestamps do feed em datetime64[ns] no horário local (FEED_TIMEZONE), sem fuso. Textos
+    # com fuso são lidos em UTC e convertidos; sem fuso já estão no horário local. Offsets
+    # diferentes ou fuso só em parte das linhas não derrubam o chunk: o que não for lido vira NaT
+    if pd.api.types.is_datetime64_any_dtype(values):
+        if isinstance(values.dtype, pd.DatetimeTZDtype):
+            values = values.dt.tz_convert(FEED_TIMEZONE).dt.tz_localize(None)
+        return values.astype('datetime64[ns]')
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # Só as categorias distintas são lidas; os códigos indexam o resultado (-1 -> NaT)
+        parsed = np.append(parse_timestamps(pd.Series(values.cat.categories)).to_numpy(), np.datetime64('NaT', 'ns'))
+        return pd.Series(parsed[values.cat.codes.to_numpy()], index=values.index)
+
+    text = values.astype(str).str.strip()
+    aware = text.str.contains(OFFSET_SUFFIX, regex=True).to_numpy()
+    result = pd.Series(np.datetime64('NaT', 'ns'), index=values.index, dtype='datetime64[ns]')
+    for mask, utc in ((aware, True), (~aware, False)):
+        if not mask.any():
+            continue
+        try:
+            with warnings.catch_warnings():
+                # O pandas só avisa (FutureWarning) ao misturar fusos sem utc=True
+                warnings.simplefilter("error", FutureWarning)
+                parsed = pd.to_datetime(text[mask], errors='coerce', format='mixed', utc=utc)
+            if isinstance(parsed.dtype, pd.DatetimeTZDtype):
+                parsed = parsed.dt.tz_convert(FEED_TIMEZONE).dt.tz_localize(None)
+        except (ValueError, TypeError, OverflowError, FutureWarning):
+            # Mistura que a leitura vetorizada não aceita (ex.: fuso em formato fora do padrão)
+            parsed = pd.to_datetime(text[mask].map(_parse_timestamp))
+        result[mask] = parsed.astype('datetime64[ns]')
+    return result
+
+
+def normalize_events(chunk):
+    # Retorna (DataFrame no esquema compacto, linhas descartadas). Linhas sem timestamp,
+    # coordenadas ou intensidade válidas, ou com tipo desconhecido, são descartadas; a
+    # intensidade é limitada a 0-10 e a chuva ausente vira 0.
+    chunk = chunk.rename(columns=canonical_column)
+    missing = [column for column in REQUIRED_COLUMNS if column not in chunk.columns]
+    if missing:
+        raise ValueError(f"Colunas obrigatórias ausentes no feed: {missing}. Colunas recebidas: {list(chunk.columns)}.")
+
+    timestamps = parse_timestamps(chunk['timestamp'])
+    lat = pd.to_numeric(chunk['lat'], errors='coerce').to_numpy(dtype=np.float64)
+    lon = pd.to_numeric(chunk['lon'], errors='coerce').to_numpy(dtype=np.float64)
+    intensity = pd.to_numeric(chunk['intensity'], errors='coerce').to_numpy(dtype=np.float64)
+    type_labels, type_values = pd.factorize(chunk['type'])
+    type_lookup = np.array([TYPE_ALIASES.get(str(value).strip().lower()) for value in type_values] + [None], dtype=object)
+    types = pd.Categorical(type_lookup[type_labels], dtype=TYPE_DTYPE) # Código -1 (nulo) cai no None final
+
+    if 'rain_forecast_mm' in chunk.columns:
+        rain = pd.to_numeric(chunk['rain_forecast_mm'], errors='coerce').fillna(0).to_numpy()
+    else:
+        rain = np.zeros(len(chunk))
+    if 'location_name' in chunk.columns:
+        locations = chunk['location_name'].astype('category')
+        locations = locations.cat.rename_categories(locations.cat.categories.astype(str))
+        if locations.isna().any():
+            if DEFAULT_LOCATION_NAME not in locations.cat.categories:
+                locations = locations.cat.add_categories([DEFAULT_LOCATION_NAME])
+            locations = locations.fillna(DEFAULT_LOCATION_NAME)
+        locations = locations.array
+    else:
+        locations = pd.Categorical.from_codes(np.zeros(len(chunk), dtype=np.int8), [DEFAULT_LOCATION_NAME])
+
+    valid = (
+        timestamps.notna().to_numpy()
+        & np.isfinite(lat) & (np.abs(lat) <= 90)
+        & np.isfinite(lon) & (np.abs(lon) <= 180)
+        & np.isfinite(intensity)
+        & (types.codes >= 0)
+    )
+    timestamps = timestamps[valid]
+    normalized = pd.DataFrame({
+        'lat': lat[valid].astype(np.float32),
+        'lon': lon[valid].astype(np.float32),
+        'intensity': np.clip(intensity[valid], 0, 10).astype(np.float32),
+        'type': types[valid],
+        'location_name': locations[valid].remove_unused_categories(),
+        'timestamp': timestamps.to_numpy(),
+        'day_of_week': timestamps.dt.dayofweek.to_numpy(dtype=np.int8),
+        'rain_forecast_mm': np.clip(rain[valid], 0, np.iinfo(np.int16).max).astype(np.int16),
+    })
+    return normalized, int((~valid).sum())
+
+
+# --- Pipeline ---
+class IngestStats:
+    def __init__(self):
+        self.chunks = 0
+        self.rows_read = 0
+        self.rows_ingested = 0
+        self.rows_rejected = 0
+        self.seconds = 0.0
+        self.peak_python_bytes = None
+        self.peak_arrow_bytes = None
+
+    @property
+    def rows_per_second(self):
+        return self.rows_read / self.seconds if self.seconds else float("nan")
+
+    def as_dict(self):
+        return {
+            "chunks": self.chunks,
+            "rows_read": self.rows_read,
+            "rows_ingested": self.rows_ingested,
+            "rows_rejected": self.rows_rejected,
+            "seconds": self.seconds,
+            "rows_per_second": self.rows_per_second,
+            "peak_python_bytes": self.peak_python_bytes,
+            "peak_arrow_bytes": self.peak_arrow_bytes,
+        }
+
+
+def ingest(source, index=None, flush_rows=DEFAULT_FLUSH_ROWS, track_memory=False):
+    # Lê a fonte bloco a bloco e acrescenta as linhas válidas ao índice (EventIndex ou outro
+    # destino com .add(df)); retorna (índice, IngestStats). track_memory liga o tracemalloc,
+    # que mede o pico de memória do Python/NumPy mas deixa a ingestão mais lenta.
+    index = EventIndex() if index is None else index
+    stats = IngestStats()
+    pool = pa.default_memory_pool()
+    arrow_baseline = pool.max_memory() or 0
+    if track_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    pending, pending_rows = [], 0
+    try:
+        for chunk in source:
+            normalized, rejected = normalize_events(chunk)
+            stats.chunks += 1
+            stats.rows_read += len(chunk)
+            stats.rows_rejected += rejected
+            if normalized.empty:
+                continue
+            pending.append(normalized)
+            pending_rows += len(normalized)
+            if pending_rows >= flush_rows:
+                index.add(concat_frames(pending))
+                stats.rows_ingested += pending_rows
+                pending, pending_rows = [], 0
+        if pending:
+            index.add(concat_frames(pending))
+            stats.rows_ingested += pending_rows
+    finally:
+        stats.seconds = time.perf_counter() - start
+        if track_memory:
+            stats.peak_python_bytes = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        stats.peak_arrow_bytes = max((pool.max_memory() or 0) - arrow_baseline, 0)
+    return index, stats
+
+
+def write_sample_feed(path, rows, city_lat=-7.1197, city_lon=-34.8450, city_name="João Pessoa, PB", seed=0):
+    # Feed sintético no formato "cru" (timestamps ISO, tipos em inglês, colunas com nomes
+    # alternativos) para testar e medir a ingestão; ~1% das linhas vêm inválidas de propósito
+    import simulation
+
+    locations = simulation.get_base_locations(city_lat, city_lon, city_name)
+    rng = np.random.default_rng(seed)
+    loc = rng.integers(0, len(locations), rows)
+    loc_type = np.array([l[0] for l in locations])[loc]
+    english_types = np.array(["traffic", "crowd", "flood"], dtype=object)[loc_type]
+    english_types[rng.random(rows) < 0.005] = "unknown"
+    intensity = rng.uniform(0, 10, rows).round(2)
+    intensity[rng.random(rows) < 0.005] = np.nan
+    start = np.datetime64('2025-06-01T00:00:00')
+    timestamps = start + rng.integers(0, 7 * 24 * 3600, rows).astype('timedelta64[s]')
+    feed = pd.DataFrame({
+        'ts': np.datetime_as_string(np.sort(timestamps), unit='s'),
+        'latitude': np.array([l[2] for l in locations])[loc] + rng.normal(0, 0.001, rows),
+        'longitude': np.array([l[3] for l in locations])[loc] + rng.normal(0, 0.001, rows),
+        'event_type': english_types,
+        'value': intensity,
+        'sensor': np.array([l[1] for l in locations], dtype=object)[loc],
+        'rain_mm': rng.choice([0, 5, 15, 40], rows),
+    })
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".parquet":
+        feed.to_parquet(path, index=False)
+    elif extension in (".jsonl", ".ndjson"):
+        feed.to_json(path, orient="records", lines=True, force_ascii=False)
+    else:
+        feed.to_csv(path, index=False)
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingere um feed de eventos (CSV, Parquet ou JSONL) e mede vazão e memória.")
+    parser.add_argument("path", help="Arquivo .csv, .parquet ou .jsonl")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--flush-rows", type=int, default=DEFAULT_FLUSH_ROWS)
+    parser.add_argument("--track-memory", action="store_true", help="Mede o pico de memória com tracemalloc (mais lento).")
+    parser.add_argument("--sample", type=int, metavar="LINHAS", help="Antes de ingerir, grava em path um feed sintético com LINHAS linhas.")
+    parser.add_argument("--store-dir", help="Grava cada flush em arquivos diários neste diretório em vez de mantê-los em memória.")
+    args = parser.parse_args()
+
+    if args.sample:
+        write_sample_feed(args.path, args.sample)
+    index = None
+    if args.store_dir:
+        from dataset_store import DayFileWriter
+
+        index = DayFileWriter(args.store_dir)
+    index, stats = ingest(open_source(args.path, args.chunk_rows), index, flush_rows=args.flush_rows, track_memory=args.track_memory)
+    print(f"{stats.rows_ingested} linhas ingeridas ({stats.rows_rejected} descartadas) em {len(index.dates)} dias, "
+          f"{stats.chunks} blocos, {stats.seconds:.2f}s -> {stats.rows_per_second:,.0f} linhas/s")
+    if stats.peak_python_bytes is not None:
+        print(f"pico de memória (tracemalloc): {stats.peak_python_bytes / 1024**2:.1f} MB")
+    print(f"pico do pool do Arrow: {stats.peak_arrow_bytes / 1024**2:.1f} MB")
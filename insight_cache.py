@@ -0,0 +1,92 @@
+import contextlib
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+# --- Cache Persistente de Insights da IA ---
+# Respostas do modelo ficam num SQLite em disco, chaveadas por um hash das entradas do prompt
+# (cidade, data, faixa de horas, tipos, resumo...). Entradas expiram após ttl_seconds e, acima
+# de max_entries, as menos acessadas recentemente são removidas (LRU). Pedidos simultâneos da
+# mesma chave são agrupados num único job pelo InsightWorker, que grava a resposta aqui.
+CACHE_DIR = os.getenv("GEOPREDICTOR_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"))
+DEFAULT_TTL_SECONDS = 6 * 60 * 60
+DEFAULT_MAX_ENTRIES = 1000
+
+
+def insight_key(inputs):
+    # Hash estável das entradas: chaves ordenadas, espaços normalizados e floats arredondados
+    def normalize(value):
+        if isinstance(value, dict):
+            return {str(k): normalize(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [normalize(v) for v in value]
+        if isinstance(value, float):
+            return round(value, 3)
+        if isinstance(value, str):
+            return " ".join(value.split())
+        if hasattr(value, "isoformat"):
+            return value.isoformat()
+        if hasattr(value, "item"): # escalares NumPy
+            return normalize(value.item())
+        return value
+
+    canonical = json.dumps(normalize(inputs), sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class InsightCache:
+    def __init__(self, path=None, ttl_seconds=DEFAULT_TTL_SECONDS, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path or os.path.join(CACHE_DIR, "insights.sqlite3")
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS insights ("
+                " key TEXT PRIMARY KEY, response TEXT NOT NULL,"
+                " created_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS insights_last_access ON insights (last_access)")
+
+    @contextlib.contextmanager
+    def _connect(self):
+        # Uma conexão por operação: seguro entre threads e entre processos (workers do Streamlit)
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key):
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("SELECT response, created_at FROM insights WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            response, created_at = row
+            if now - created_at > self.ttl_seconds:
+                conn.execute("DELETE FROM insights WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE insights SET last_access = ? WHERE key = ?", (now, key))
+            return response
+
+    def put(self, key, response):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO insights (key, response, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, response, now, now),
+            )
+            conn.execute("DELETE FROM insights WHERE created_at < ?", (now - self.ttl_seconds,))
+            conn.execute(
+                "DELETE FROM insights WHERE key IN ("
+                " SELECT key FROM insights ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def __len__(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM insights").fetchone()[0]
@@ -0,0 +1,263 @@
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# --- Geração de Insights em Segundo Plano ---
+# O modelo é chamado em modo streaming numa thread do InsightWorker; o script do Streamlit só
+# consulta o InsightJob (texto parcial e estado) a cada POLL_INTERVAL_SECONDS, então mapa e
+# filtros continuam respondendo durante a chamada. Jobs são compartilhados por chave do cache
+# entre sessões e cancelados quando a última sessão interessada se desinscreve (ex.: mudou
+# os filtros). Falhas são repetidas com backoff exponencial; o texto parcial é descartado a
+# cada nova tentativa. Um RateLimiter opcional espaça as chamadas ao modelo (cota da API).
+# O stream é lido numa thread à parte e consumido por uma fila, para que o prazo de
+# timeout_seconds valha mesmo quando o modelo não envia nenhum trecho.
+DEFAULT_TIMEOUT_SECONDS = 60
+DEFAULT_MAX_RETRIES = 2
+DEFAULT_BACKOFF_SECONDS = 1.0
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_MAX_FINISHED_JOBS = 64
+POLL_INTERVAL_SECONDS = 0.3
+
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+_END_OF_STREAM = object()
+
+
+def stream_text(model, prompt_text, timeout_seconds=DEFAULT_TIMEOUT_SECONDS):
+    # Trechos de texto de generate_content(stream=True); serve para genai.GenerativeModel e StubModel
+    response = model.generate_content(prompt_text, stream=True, request_options={"timeout": timeout_seconds})
+    for chunk in response:
+        if chunk.text:
+            yield chunk.text
+
+
+class RateLimiter:
+    # Libera no máximo rate_per_second chamadas por segundo, espaçadas igualmente entre threads
+    def __init__(self, rate_per_second):
+        self.interval = 1.0 / rate_per_second
+        self._lock = threading.Lock()
+        self._next_at = 0.0
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_at - now
+            self._next_at = max(self._next_at, now) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+class InsightJob:
+    def __init__(self, key, prompt_text):
+        self.key = key
+        self.prompt_text = prompt_text
+        self.status = RUNNING
+        self.source = "generated"
+        self.chunks = []
+        self.error = None
+        self.attempts = 0
+        self.subscribers = set()
+        self.submitted_at = time.monotonic()
+        self.started_at = None
+        self.first_token_at = None
+        self.finished_at = None
+        self._cancel = threading.Event()
+        self._done = threading.Event()
+
+    @property
+    def text(self):
+        return "".join(self.chunks)
+
+    @property
+    def finished(self):
+        return self.status != RUNNING
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    @property
+    def time_to_first_token(self):
+        # Medido, como latency, a partir do início da chamada ao modelo
+        if self.first_token_at is None or self.started_at is None:
+            return None
+        return self.first_token_at - self.started_at
+
+    @property
+    def queue_wait(self):
+        # Espera na fila do pool e no limitador antes da primeira chamada
+        if self.started_at is None:
+            return None
+        return self.started_at - self.submitted_at
+
+    @property
+    def elapsed(self):
+        return (self.finished_at or time.monotonic()) - self.submitted_at
+
+    @property
+    def latency(self):
+        # Duração das chamadas ao modelo, sem a espera na fila e no limitador
+        if self.started_at is None:
+            return None
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    def cancel(self):
+        self._cancel.set()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def _append(self, text):
+        if self.first_token_at is None:
+            self.first_token_at = time.monotonic()
+        self.chunks.append(text)
+
+    def _finish(self, status, error=None):
+        self.error = error
+        self.finished_at = time.monotonic()
+        self.status = status
+        self._done.set()
+
+
+class InsightWorker:
+    def __init__(self, model, cache=None, timeout_seconds=DEFAULT_TIMEOUT_SECONDS, max_retries=DEFAULT_MAX_RETRIES,
+                 backoff_seconds=DEFAULT_BACKOFF_SECONDS, max_workers=DEFAULT_MAX_WORKERS, max_finished_jobs=DEFAULT_MAX_FINISHED_JOBS,
+                 rate_limiter=None):
+        self.model = model
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+        self.timeout_seconds = timeout_seconds
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.max_finished_jobs = max_finished_jobs
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="insight-worker")
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+
+    def submit(self, key, prompt_text, subscriber=None):
+        # Retorna o job da chave, reaproveitando um em andamento ou concluído; respostas já em
+        # cache viram um job concluído na hora, sem passar pelo modelo
+        looked_up_at = time.monotonic()
+        cached = self.cache.get(key) if self.cache is not None else None
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is None or job.cancelled or job.status in (FAILED, CANCELLED) or self._expired(job, cached, looked_up_at):
+                job = InsightJob(key, prompt_text)
+                self._jobs[key] = job
+                if cached is not None:
+                    job.source = "cache"
+                    job._append(cached)
+                    job._finish(DONE)
+                else:
+                    self._executor.submit(self._run, job)
+                self._evict_finished()
+            else:
+                self._jobs.move_to_end(key)
+            if subscriber is not None:
+                job.subscribers.add(subscriber)
+            return job
+
+    def get(self, key):
+        with self._lock:
+            return self._jobs.get(key)
+
+    def release(self, key, subscriber):
+        # Desinscreve a sessão; sem mais interessados, um job em andamento é cancelado
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is None:
+                return
+            job.subscribers.discard(subscriber)
+            if not job.subscribers and not job.finished:
+                job.cancel()
+
+    def shutdown(self):
+        with self._lock:
+            for job in self._jobs.values():
+                job.cancel()
+        self._executor.shutdown(wait=False)
+
+    def _expired(self, job, cached, looked_up_at):
+        # Um job concluído só vale enquanto a resposta estaria no cache: passado o TTL, ou se a
+        # chave já saiu do cache (expirada ou removida pelo LRU), a resposta é gerada de novo.
+        # Jobs concluídos depois da consulta ao cache ainda não aparecem em cached.
+        if job.status != DONE or self.cache is None:
+            return False
+        if time.monotonic() - job.finished_at > self.cache.ttl_seconds:
+            return True
+        return cached is None and job.finished_at < looked_up_at
+
+    def _evict_finished(self):
+        finished = [key for key, job in self._jobs.items() if job.finished]
+        for key in finished[:max(len(finished) - self.max_finished_jobs, 0)]:
+            del self._jobs[key]
+
+    def _run(self, job):
+        for attempt in range(self.max_retries + 1):
+            job.attempts = attempt + 1
+            job.chunks = []
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            if job.cancelled:
+                job._finish(CANCELLED)
+                return
+            started = time.monotonic()
+            if job.started_at is None:
+                job.started_at = started
+            try:
+                for text in self._stream_until(job, started + self.timeout_seconds):
+                    if job.cancelled:
+                        break
+                    job._append(text)
+                if job.cancelled:
+                    job._finish(CANCELLED)
+                    return
+                if self.cache is not None:
+                    self.cache.put(job.key, job.text)
+                job._finish(DONE)
+                return
+            except Exception as e:
+                if attempt == self.max_retries:
+                    job._finish(FAILED, e)
+                    return
+                # Espera o backoff, mas acorda na hora se o job for cancelado
+                if job._cancel.wait(self.backoff_seconds * 2 ** attempt):
+                    job._finish(CANCELLED)
+                    return
+
+    def _stream_until(self, job, deadline):
+        # Trechos do stream até o prazo; a leitura do modelo fica numa thread produtora e aqui
+        # só se espera na fila, acordando a cada POLL_INTERVAL_SECONDS para ver o cancelamento.
+        # Uma thread produtora abandonada no timeout termina pelo timeout da própria requisição.
+        chunks = queue.Queue()
+
+        def produce():
+            try:
+                for text in stream_text(self.model, job.prompt_text, self.timeout_seconds):
+                    chunks.put(text)
+                    if job.cancelled:
+                        break
+            except Exception as e:
+                chunks.put(e)
+            chunks.put(_END_OF_STREAM)
+
+        threading.Thread(target=produce, name="insight-stream", daemon=True).start()
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"Resposta não concluída em {self.timeout_seconds}s.")
+            try:
+                item = chunks.get(timeout=min(remaining, POLL_INTERVAL_SECONDS))
+            except queue.Empty:
+                if job.cancelled:
+                    return
+                continue
+            if item is _END_OF_STREAM:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
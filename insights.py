@@ -0,0 +1,81 @@
+from insight_cache import insight_key
+from simulation import day_names, type_areas
+from summary import DEFAULT_TOP_N, percentile_columns, summarize_typed
+
+# --- Prompt de Insights ---
+# Resumo por tipo (summary.py), prompt e chave de cache usados pelo botão do app e pelos jobs em lote
+# (batch_insights.py). A chave só coincide entre os dois se as entradas coincidirem: com a
+# previsão local no prompt, o lote ajusta o modelo em --history-days de histórico e o app na
+# janela carregada, então as previsões (e as chaves) em geral diferem.
+
+
+def summary_lines(summary, top_n=DEFAULT_TOP_N):
+    # Um bloco de texto por tipo com ocorrências, no formato lido pelo modelo
+    summary_data = []
+    for data_type in summary.types:
+        stats = summary.by_type.loc[data_type]
+        locations = summary.locations(data_type)
+        areas = [type_areas[data_type]]
+        top_locations = summary.top_locations(data_type, top_n)
+        top_labels = [f"{name} ({mean:.1f})" for name, mean in top_locations['mean'].items()]
+        percentiles = ", ".join(f"{column} {stats[column]:.1f}" for column in percentile_columns(summary))
+
+        summary_data.append(
+            f"- Tipo: {data_type}\n"
+            f"  Locais Afetados: {', '.join(locations)}\n"
+            f"  Áreas Geográficas: {', '.join(areas)}\n"
+            f"  Intensidade Média: {stats['mean']:.1f} (de 10)\n"
+            f"  Pico de Intensidade: {stats['max']:.1f} (de 10)\n"
+            f"  Percentis de Intensidade: {percentiles}\n"
+            f"  Horário de Pico: {int(stats['peak_hour'])}h (média {stats['peak_hour_mean']:.1f})\n"
+            f"  Locais Mais Intensos: {', '.join(top_labels)}\n"
+        )
+    return summary_data
+
+
+def summarize_types(typed_frames, top_n=DEFAULT_TOP_N):
+    return summary_lines(summarize_typed(typed_frames), top_n)
+
+
+def build_prompt(city_name, selected_date, hour_range, rain_forecast_mm, summary_data, forecast_data=None, horizon_hours=None):
+    # forecast_data: linhas de forecast.forecast_lines; com elas, a previsão das próximas horas
+    # parte dos números do modelo local em vez de ficar só a cargo da IA
+    day_name_for_ai = day_names[selected_date.weekday()]
+    forecast_section = ""
+    horizon_label = "2-4"
+    forecast_instruction = "Com base nos padrões históricos (implícitos no dataset simulado) e nos dados atuais, preveja"
+    if forecast_data:
+        horizon_label = str(horizon_hours)
+        forecast_section = (
+            f"**Previsão Numérica Local para as Próximas {horizon_label} Horas (perfil sazonal por local + efeito da chuva):**\n"
+            f"{' '.join(forecast_data)}\n\n"
+        )
+        forecast_instruction = "Partindo da previsão numérica local acima (explique-a e ajuste-a com seu conhecimento da cidade se necessário), descreva"
+    return (
+        f"Você é um analista de dados urbanos para a cidade de **{city_name}**, utilizando um sistema de previsão com IA.\n"
+        f"A data de análise é {selected_date.strftime('%d/%m/%Y')} e o período de interesse é das {hour_range[0]}h às {hour_range[1]}h. "
+        f"O dia da semana é {day_name_for_ai}. A previsão de chuva simulada para este dia é de {rain_forecast_mm}mm.\n\n"
+        f"**Dados Observados para o Período e Local Selecionados:**\n"
+        f"{'Não há ocorrências significativas para este período e localização.' if not summary_data else ' '.join(summary_data)}\n\n"
+        f"{forecast_section}"
+        f"Com base nesses dados e no conhecimento de padrões urbanos típicos (tráfego de pico, fluxo turístico, áreas de alagamento) para uma cidade como {city_name}: \n"
+        f"1. **Análise dos Padrões:** Descreva de forma concisa o que está acontecendo ou o que é esperado acontecer em **{city_name}** durante o período selecionado, destacando as áreas e tipos de ocorrência mais relevantes.\n"
+        f"2. **Previsão Futura:** {forecast_instruction} como a situação pode evoluir nas **próximas {horizon_label} horas** em **{city_name}**.\n"
+        f"3. **Recomendações Acionáveis:** Forneça 2-3 recomendações específicas e práticas para os órgãos responsáveis (Ex: Secretaria de Trânsito, Defesa Civil, Secretaria de Turismo, etc.) para gerenciar a situação ou otimizar recursos em **{city_name}**.\n"
+        f"Formate sua resposta em seções claras: **Análise dos Padrões**, **Previsão Futura** e **Recomendações Acionáveis**."
+    )
+
+
+def prompt_cache_key(model_name, city_name, selected_date, hour_range, types, rain_forecast_mm, summary_data, forecast_data=None):
+    payload = {
+        "model": model_name,
+        "city": city_name,
+        "date": selected_date,
+        "hour_range": hour_range,
+        "types": sorted(types),
+        "rain_forecast_mm": rain_forecast_mm,
+        "summary": summary_data,
+    }
+    if forecast_data:
+        payload["forecast"] = forecast_data
+    return insight_key(payload)
@@ -0,0 +1,75 @@
+import re
+import time
+
+# --- Backends de Modelo ---
+# StubModel imita a interface usada de genai.GenerativeModel (generate_content(...).text, ou
+# um iterador de trechos com stream=True) sem rede nem cota, com latência configurável;
+# serve para rodar o app e os lotes offline. failures > 0 faz as primeiras chamadas falharem,
+# para exercitar retentativas. Como a API, respeita request_options["timeout"]: uma resposta
+# que passaria do prazo levanta TimeoutError ao atingi-lo.
+GEMINI_MODEL_NAME = "gemini-2.0-flash"
+STUB_MODEL_NAME = "stub"
+
+
+def load_gemini_model(api_key, model_name=GEMINI_MODEL_NAME):
+    import google.generativeai as genai
+
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel(model_name)
+
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubModel:
+    def __init__(self, latency_seconds=0.0, reply=None, chunk_delay_seconds=0.0, failures=0):
+        self.latency_seconds = latency_seconds
+        self.reply = reply
+        self.chunk_delay_seconds = chunk_delay_seconds
+        self.failures = failures
+        self.calls = 0
+
+    def _reply_for(self, prompt_text):
+        if self.reply is not None:
+            return self.reply
+        first_line = prompt_text.strip().splitlines()[0] if prompt_text.strip() else ""
+        return (
+            "**Análise dos Padrões**\n"
+            f"Resposta simulada (modelo local) para: {first_line}\n\n"
+            "**Previsão Futura**\n"
+            "Tendência estável nas próximas 2-4 horas.\n\n"
+            "**Recomendações Acionáveis**\n"
+            "1. Monitorar os pontos de maior intensidade.\n"
+            "2. Reavaliar os filtros com dados reais."
+        )
+
+    def generate_content(self, prompt_text, stream=False, request_options=None):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ConnectionError(f"Falha simulada do modelo local (chamada {self.calls}).")
+        timeout = (request_options or {}).get("timeout")
+        if stream:
+            return self._stream(prompt_text, timeout)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        _sleep_until(self.latency_seconds, deadline)
+        return StubResponse(self._reply_for(prompt_text))
+
+    def _stream(self, prompt_text, timeout=None):
+        # latency_seconds vira o tempo até o primeiro trecho; depois, uma palavra por trecho
+        deadline = None if timeout is None else time.monotonic() + timeout
+        _sleep_until(self.latency_seconds, deadline)
+        for word in re.findall(r"\S+\s*", self._reply_for(prompt_text)):
+            yield StubResponse(word)
+            _sleep_until(self.chunk_delay_seconds, deadline)
+
+
+def _sleep_until(seconds, deadline):
+    # Dorme seconds, ou só até o prazo e levanta TimeoutError se ele vier antes
+    if not seconds:
+        return
+    if deadline is not None and time.monotonic() + seconds > deadline:
+        time.sleep(max(deadline - time.monotonic(), 0))
+        raise TimeoutError("Prazo da requisição ao modelo local esgotado.")
+    time.sleep(seconds)
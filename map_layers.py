@@ -0,0 +1,279 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pydeck as pdk
+from pydeck.bindings.json_tools import default_serialize, to_camel_case
+
+from binary_transport import BINARY_TRANSPORT_MIN_POINTS, BinaryDeck, encode_binary_layer
+
+TOOLTIP_STYLE = {"backgroundColor": "rgba(50, 50, 50, 0.8)", "color": "white", "font-size": "14px", "padding": "10px", "border-radius": "5px"}
+
+# --- Escalas de cor por tipo (AGORA MAIS DIRETAS E VIBRANTES) ---
+# (limiares decrescentes de intensidade, cores RGBA 0-255); a última cor vale abaixo do menor limiar
+COLOR_SCALES = {
+    'Tráfego Intenso': ([7, 4], [
+        [255, 0, 0, 230],     # Vermelho vibrante (Alto Tráfego)
+        [255, 140, 0, 200],   # Laranja (Médio Tráfego)
+        [0, 200, 0, 180],     # Verde (Baixo Tráfego)
+    ]),
+    'Concentração Turística': ([7, 4], [
+        [0, 0, 200, 230],     # Azul escuro (Muito Turista)
+        [0, 100, 255, 200],   # Azul (Turista Moderado)
+        [100, 200, 255, 180], # Azul claro (Pouco Turista)
+    ]),
+    'Risco de Alagamento': ([8, 5, 2], [
+        [178, 34, 34, 230],   # Vermelho Tijolo (Risco Crítico)
+        [255, 69, 0, 200],    # Vermelho Laranja (Alto Risco)
+        [255, 215, 0, 180],   # Amarelo Ouro (Risco Moderado)
+        [30, 144, 255, 160],  # Azul (Baixo Risco)
+    ]),
+}
+
+# --- Estilo de cada camada ---
+# O tamanho (altura da coluna ou raio) é intensity * size_scale + size_offset
+LAYER_STYLES = {
+    # Camada para Tráfego Intenso (ColumnLayer)
+    'Tráfego Intenso': {
+        "layer_type": "ColumnLayer",
+        "color_prop": "get_fill_color",
+        "size_prop": "get_elevation", "size_scale": 50, "size_offset": 0, # Altura da coluna
+        "props": {"radius": 40, "extruded": True, "opacity": 0.9}, # Largura da coluna
+        "tooltip_lines": ["Intensidade: {intensity} / 10"],
+    },
+    # Camada para Concentração Turística (ScatterplotLayer)
+    'Concentração Turística': {
+        "layer_type": "ScatterplotLayer",
+        "color_prop": "get_fill_color",
+        "size_prop": "get_radius", "size_scale": 8, "size_offset": 20, # Raio varia com a intensidade
+        "props": {"opacity": 0.8},
+        "tooltip_lines": ["Pessoas: {intensity} / 10"],
+    },
+    # Camada para Risco de Alagamento (ColumnLayer)
+    'Risco de Alagamento': {
+        "layer_type": "ColumnLayer",
+        "color_prop": "get_fill_color",
+        "size_prop": "get_elevation", "size_scale": 60, "size_offset": 0,
+        "props": {"radius": 40, "extruded": True, "opacity": 0.9},
+        "tooltip_lines": ["Risco: {intensity} / 10", "Previsão Chuva: {rain_forecast_mm}mm"],
+    },
+}
+
+
+# Camada da previsão local (forecast.py): anéis sem preenchimento no pico previsto de cada
+# local, com a cor da escala do tipo, sobrepostos às ocorrências observadas
+FORECAST_LAYER_ID = "Previsão"
+FORECAST_STYLE = {
+    "layer_type": "ScatterplotLayer",
+    "color_prop": "get_line_color",
+    "size_prop": "get_radius", "size_scale": 15, "size_offset": 60,
+    "props": {"stroked": True, "filled": False, "line_width_min_pixels": 2, "opacity": 0.9},
+}
+FORECAST_TOOLTIP_LINES = ["<b>{location_name}</b>", "Tipo: {type}", "Pico previsto: {intensity} / 10", "Horário previsto: {hour_label}"]
+
+
+def size_expression(style):
+    expression = f"intensity * {style['size_scale']}"
+    return expression + f" + {style['size_offset']}" if style["size_offset"] else expression
+
+
+def intensity_colors(type_name, intensity):
+    # Mapeia intensidade para RGBA de forma vetorizada; retorna array (N, 4) uint8
+    thresholds, palette = COLOR_SCALES[type_name]
+    intensity = np.asarray(intensity)
+    conditions = [intensity >= t for t in thresholds]
+    color_idx = np.select(conditions, list(range(len(thresholds))), default=len(thresholds))
+    return np.asarray(palette, dtype=np.uint8)[color_idx]
+
+
+# Rótulos "HH:MM" de cada minuto do dia, formatados uma única vez em vez de strftime por linha
+HOUR_LABELS = np.array([f"{m // 60:02d}:{m % 60:02d}" for m in range(24 * 60)], dtype=object)
+
+
+def minute_of_day(timestamps):
+    return (timestamps.dt.hour * 60 + timestamps.dt.minute).to_numpy()
+
+
+def is_aggregated(df):
+    # Células produzidas por spatial_bins.aggregate_points trazem contagem e máximo por célula
+    return 'count' in df.columns
+
+
+def tooltip_columns(type_name, df):
+    # Campos usados pelos tooltips, como arrays numéricos ou categóricos (rótulos)
+    columns = {
+        'intensity': df['intensity'].to_numpy(dtype=np.float64).round(1),
+        'type': pd.Categorical.from_codes(np.zeros(len(df), dtype=np.int8), categories=[type_name]),
+        'location_name': df['location_name'].array,
+    }
+    if is_aggregated(df):
+        columns['intensity_max'] = df['intensity_max'].to_numpy(dtype=np.float64).round(1)
+        columns['count'] = df['count'].to_numpy()
+        columns['hour_label'] = df['hour_label'].array
+    else:
+        columns['hour_label'] = pd.Categorical.from_codes(minute_of_day(df['timestamp']), categories=HOUR_LABELS)
+    if type_name == 'Risco de Alagamento':
+        columns['rain_forecast_mm'] = df['rain_forecast_mm'].to_numpy()
+    return columns
+
+
+def layer_frame(type_name, df):
+    # Recorta o DataFrame às colunas usadas pela camada (o resto não entra no JSON),
+    # com cor e rótulo de horário pré-calculados
+    colors = intensity_colors(type_name, df['intensity'].to_numpy())
+    frame = pd.DataFrame({
+        'lon': df['lon'].to_numpy(dtype=np.float64).round(5), # ~1 m de precisão
+        'lat': df['lat'].to_numpy(dtype=np.float64).round(5),
+        'r': colors[:, 0], 'g': colors[:, 1], 'b': colors[:, 2], 'a': colors[:, 3],
+    })
+    for name, values in tooltip_columns(type_name, df).items():
+        frame[name] = np.asarray(values, dtype=object) if isinstance(values, pd.Categorical) else values
+    return frame
+
+
+def layer_tooltip(type_name, aggregated=False):
+    lines = ["<b>{location_name}</b>", "Tipo: {type}"] + LAYER_STYLES[type_name]["tooltip_lines"]
+    if aggregated:
+        lines += ["Pico: {intensity_max} / 10", "Ocorrências na célula: {count}"]
+    lines += ["Horário: {hour_label}"]
+    return {"html": "<br/>".join(lines), "style": TOOLTIP_STYLE}
+
+
+def layer_props(style, radius=None):
+    props = dict(style["props"])
+    if radius and "radius" in props:
+        props["radius"] = radius
+    return props
+
+
+def build_layer(type_name, df, radius=None):
+    style = LAYER_STYLES[type_name]
+    props = layer_props(style, radius)
+    return pdk.Layer(
+        style["layer_type"],
+        layer_frame(type_name, df),
+        id=type_name,
+        get_position=["lon", "lat"],
+        pickable=True,
+        auto_highlight=True,
+        tooltip=layer_tooltip(type_name, is_aggregated(df)),
+        **{style["color_prop"]: "[r, g, b, a]", style["size_prop"]: size_expression(style)},
+        **props,
+    )
+
+
+class PreserializedDeck(pdk.Deck):
+    # Deck que serializa para JSON uma única vez (sem a indentação padrão do pydeck);
+    # st.pydeck_chart chama to_json() a cada rerun
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._json = json.dumps(self, sort_keys=True, default=default_serialize, separators=(",", ":"))
+
+    def to_json(self):
+        return self._json
+
+
+def build_binary_layer(type_name, df, radius=None):
+    # Mesma camada de build_layer, mas com os atributos empacotados em typed arrays
+    style = LAYER_STYLES[type_name]
+    props = layer_props(style, radius)
+    intensity = df['intensity'].to_numpy(dtype=np.float32)
+    return encode_binary_layer(
+        type_name,
+        style["layer_type"],
+        positions=np.column_stack([df['lon'].to_numpy(), df['lat'].to_numpy()]),
+        colors=intensity_colors(type_name, intensity),
+        color_accessor=to_camel_case(style["color_prop"]),
+        sizes=intensity * style["size_scale"] + style["size_offset"],
+        size_accessor=to_camel_case(style["size_prop"]),
+        props={to_camel_case(key): value for key, value in props.items()},
+        tooltip=layer_tooltip(type_name, is_aggregated(df)),
+        tooltip_fields=tooltip_columns(type_name, df),
+    )
+
+
+def forecast_columns(peaks):
+    # Cores pela escala de cada tipo e campos do tooltip dos picos previstos (forecast.forecast_peaks)
+    intensity = peaks['intensity'].to_numpy(dtype=np.float64)
+    types = peaks['type'].to_numpy()
+    colors = np.zeros((len(peaks), 4), dtype=np.uint8)
+    for type_name in COLOR_SCALES:
+        rows = types == type_name
+        colors[rows] = intensity_colors(type_name, intensity[rows])
+    fields = {
+        'intensity': intensity.round(1),
+        'type': peaks['type'].array,
+        'location_name': peaks['location_name'].array,
+        'hour_label': pd.Categorical.from_codes(minute_of_day(peaks['timestamp']), categories=HOUR_LABELS),
+    }
+    return colors, fields
+
+
+def build_forecast_layer(peaks):
+    colors, fields = forecast_columns(peaks)
+    frame = pd.DataFrame({
+        'lon': peaks['lon'].to_numpy(dtype=np.float64).round(5),
+        'lat': peaks['lat'].to_numpy(dtype=np.float64).round(5),
+        'r': colors[:, 0], 'g': colors[:, 1], 'b': colors[:, 2], 'a': colors[:, 3],
+    })
+    for name, values in fields.items():
+        frame[name] = np.asarray(values, dtype=object) if isinstance(values, pd.Categorical) else values
+    return pdk.Layer(
+        FORECAST_STYLE["layer_type"],
+        frame,
+        id=FORECAST_LAYER_ID,
+        get_position=["lon", "lat"],
+        pickable=True,
+        tooltip={"html": "<br/>".join(FORECAST_TOOLTIP_LINES), "style": TOOLTIP_STYLE},
+        **{FORECAST_STYLE["color_prop"]: "[r, g, b, a]", FORECAST_STYLE["size_prop"]: size_expression(FORECAST_STYLE)},
+        **FORECAST_STYLE["props"],
+    )
+
+
+def build_binary_forecast_layer(peaks):
+    colors, fields = forecast_columns(peaks)
+    intensity = peaks['intensity'].to_numpy(dtype=np.float32)
+    return encode_binary_layer(
+        FORECAST_LAYER_ID,
+        FORECAST_STYLE["layer_type"],
+        positions=np.column_stack([peaks['lon'].to_numpy(), peaks['lat'].to_numpy()]),
+        colors=colors,
+        color_accessor=to_camel_case(FORECAST_STYLE["color_prop"]),
+        sizes=intensity * FORECAST_STYLE["size_scale"] + FORECAST_STYLE["size_offset"],
+        size_accessor=to_camel_case(FORECAST_STYLE["size_prop"]),
+        props={to_camel_case(key): value for key, value in FORECAST_STYLE["props"].items()},
+        tooltip={"html": "<br/>".join(FORECAST_TOOLTIP_LINES), "style": TOOLTIP_STYLE},
+        tooltip_fields=fields,
+    )
+
+
+def build_deck(typed_frames, view_state, binary_min_points=BINARY_TRANSPORT_MIN_POINTS, radius=None, forecast_peaks=None):
+    # Monta as camadas (uma por tipo com dados) e o Deck já serializado; None se não houver dados.
+    # A partir de binary_min_points pontos no total, usa o transporte binário (BinaryDeck).
+    # radius substitui a largura fixa das colunas (usado com células agregadas).
+    # forecast_peaks (forecast.forecast_peaks) acrescenta a camada de previsão por cima.
+    typed_frames = {type_name: df for type_name, df in typed_frames.items() if not df.empty}
+    has_forecast = forecast_peaks is not None and not forecast_peaks.empty
+    if not typed_frames and not has_forecast:
+        return None
+    if sum(len(df) for df in typed_frames.values()) >= binary_min_points:
+        layers = [build_binary_layer(type_name, df, radius) for type_name, df in typed_frames.items()]
+        if has_forecast:
+            layers.append(build_binary_forecast_layer(forecast_peaks))
+        return BinaryDeck(layers, json.loads(view_state.to_json()))
+    layers = [build_layer(type_name, df, radius) for type_name, df in typed_frames.items()]
+    if has_forecast:
+        layers.append(build_forecast_layer(forecast_peaks))
+    aggregated = any(is_aggregated(df) for df in typed_frames.values())
+    tooltip_html = "<b>{location_name}</b><br/>Tipo: {type}<br/>Intensidade: {intensity}<br/>Horário: {hour_label}"
+    if aggregated:
+        tooltip_html = "<b>{location_name}</b><br/>Tipo: {type}<br/>Intensidade média: {intensity}<br/>Pico: {intensity_max}<br/>Ocorrências: {count}<br/>Horário: {hour_label}"
+    return PreserializedDeck(
+        layers=layers,
+        initial_view_state=view_state,
+        map_style="mapbox://styles/mapbox/dark-v11", # Tema escuro para o mapa base
+        tooltip={ # Este tooltip global é um fallback, os das camadas são preferíveis
+            "html": tooltip_html,
+            "style": TOOLTIP_STYLE,
+        },
+    )
@@ -0,0 +1,64 @@
+import argparse
+import datetime
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from cities import CITIES
+from dataset_store import DatasetStore, date_range, default_window
+from simulation import DEFAULT_SEED
+
+# --- Pré-aquecimento dos Datasets ---
+# Gera e grava no DatasetStore os dias do período de todas as cidades antes da primeira
+# visita, uma cidade por processo. Roda no deploy, antes de subir o Streamlit
+# (python prewarm.py), ou em segundo plano na primeira execução do app com
+# GEOPREDICTOR_PREWARM=1 (run_prewarm); em ambos os casos o app depois só mapeia os
+# arquivos prontos.
+DEFAULT_PREWARM_WORKERS = min(4, os.cpu_count() or 1)
+
+
+def _ensure_city(root, city_name, dates, seed):
+    city = CITIES[city_name]
+    start = time.perf_counter()
+    DatasetStore(root).ensure_days(city["lat"], city["lon"], city_name, dates, seed)
+    return city_name, time.perf_counter() - start
+
+
+def prewarm_datasets(start_date, end_date, city_names=None, seed=DEFAULT_SEED, store=None, max_workers=DEFAULT_PREWARM_WORKERS):
+    # Retorna {cidade: segundos}; cidades já gravadas custam só a checagem dos arquivos
+    store = store or DatasetStore()
+    city_names = list(CITIES) if city_names is None else city_names
+    dates = date_range(start_date, end_date)
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(_ensure_city, store.root, city_name, dates, seed) for city_name in city_names]
+        return dict(future.result() for future in futures)
+
+
+def run_prewarm(start_date, end_date, seed=DEFAULT_SEED, store=None):
+    # Para o app: roda este módulo num interpretador novo em vez de abrir o pool no processo
+    # do Streamlit, onde o script do app é o __main__ (seria reexecutado pelos processos
+    # filhos) e há threads do servidor ativas no fork
+    store = store or DatasetStore()
+    command = [sys.executable, os.path.abspath(__file__), "--start-date", start_date.isoformat(), "--end-date", end_date.isoformat(),
+               "--seed", str(seed), "--data-dir", store.root]
+    return subprocess.run(command, check=True, capture_output=True, text=True)
+
+
+if __name__ == "__main__":
+    window_start, window_end = default_window()
+    parser = argparse.ArgumentParser(description="Gera e grava em disco os datasets de todas as cidades.")
+    parser.add_argument("--start-date", type=datetime.date.fromisoformat, default=window_start)
+    parser.add_argument("--end-date", type=datetime.date.fromisoformat, default=window_end)
+    parser.add_argument("--cities", nargs="+", default=list(CITIES), metavar="CIDADE")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--workers", type=int, default=DEFAULT_PREWARM_WORKERS)
+    parser.add_argument("--data-dir", default=None, help="Diretório do DatasetStore (padrão: GEOPREDICTOR_DATA_DIR).")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    timings = prewarm_datasets(args.start_date, args.end_date, args.cities, seed=args.seed, store=DatasetStore(args.data_dir), max_workers=args.workers)
+    for city_name, seconds in timings.items():
+        print(f"  {city_name}: {seconds * 1000:.0f} ms")
+    print(f"{len(timings)} cidades, {args.start_date} a {args.end_date}, em {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,272 @@
+import zlib
+
+import numpy as np
+import pandas as pd
+
+# Mapear dia da semana para nome (para melhor legibilidade)
+day_names = ["Segunda-feira", "Terça-feira", "Quarta-feira", "Quinta-feira", "Sexta-feira", "Sábado", "Domingo"]
+
+# Tipos de ocorrência, na ordem em que são gerados para cada hora
+type_names = ['Tráfego Intenso', 'Concentração Turística', 'Risco de Alagamento']
+type_areas = {
+    'Tráfego Intenso': "Área de Tráfego",
+    'Concentração Turística': "Área Turística",
+    'Risco de Alagamento': "Área de Alagamento",
+}
+
+DEFAULT_SEED = 42
+
+TYPE_DTYPE = pd.CategoricalDtype(type_names)
+
+# Distribuição diária da previsão de chuva simulada (mm)
+RAIN_LEVELS_MM = np.array([0, 5, 15, 40])
+RAIN_PROBABILITIES = [0.6, 0.2, 0.15, 0.05]
+
+# Amplitude do jitter de posição e do ruído de intensidade, por tipo
+TYPE_JITTER = np.array([0.002, 0.001, 0.001])
+TYPE_NOISE = np.array([0.3, 0.3, 0.2])
+
+# --- LOCALIZAÇÕES BASE ESPECÍFICAS PARA JOÃO PESSOA (Em fase de testes) ---
+# Usaremos estas coordenadas se a cidade selecionada for "João Pessoa, PB"
+jp_traffic_locations = [
+    {"name": "Av. Epitácio Pessoa (Centro)", "lat": -7.1166, "lon": -34.8385},
+    {"name": "Av. Ruy Carneiro (Miramar)", "lat": -7.1200, "lon": -34.8450},
+    {"name": "BR-230 (Acesso Gauchinha)", "lat": -7.1350, "lon": -34.8850},
+    {"name": "Av. Beira Rio (Bancários)", "lat": -7.1000, "lon": -34.8700},
+]
+
+jp_tourist_locations = [
+    {"name": "Praia de Tambaú", "lat": -7.1187, "lon": -34.8090},
+    {"name": "Praia de Cabo Branco", "lat": -7.1300, "lon": -34.7950},
+    {"name": "Farol do Cabo Branco", "lat": -7.1490, "lon": -34.7930},
+    {"name": "Parque da Lagoa (Centro)", "lat": -7.1070, "lon": -34.8800},
+]
+
+jp_flood_locations = [
+    {"name": "Bessa (próximo à BR)", "lat": -7.0900, "lon": -34.8500},
+    {"name": "Bancários (área baixa)", "lat": -7.1000, "lon": -34.8700},
+    {"name": "Padre Zé (trechos)", "lat": -7.1250, "lon": -34.8600},
+]
+
+# --- LOCALIZAÇÕES BASE GENÉRICAS para outras Cidades (ajustadas para melhor dispersão) ---
+# Estes são offsets relativos ao centro da cidade selecionada
+generic_traffic_offsets = [
+    {"name": "Av. Principal Norte", "lat_offset": 0.02, "lon_offset": 0.01}, # +- 2.2km N, 1.1km E
+    {"name": "Av. Principal Sul", "lat_offset": -0.015, "lon_offset": 0.005}, # +- 1.6km S, 0.5km E
+    {"name": "Anel Viário Leste", "lat_offset": 0.005, "lon_offset": -0.025}, # +- 0.5km N, 2.7km W
+]
+generic_tourist_offsets = [
+    {"name": "Ponto Turístico Principal", "lat_offset": 0.01, "lon_offset": -0.03}, # +- 1.1km N, 3.3km W
+    {"name": "Praça Histórica Central", "lat_offset": -0.005, "lon_offset": 0.002}, # +- 0.5km S, 0.2km E
+]
+generic_flood_offsets = [
+    {"name": "Área de Baixo Relevo 1", "lat_offset": 0.008, "lon_offset": -0.018}, # +- 0.8km N, 2km W
+    {"name": "Região Próxima ao Rio", "lat_offset": -0.012, "lon_offset": 0.01}, # +- 1.3km S, 1.1km E
+]
+
+
+def get_base_locations(city_lat, city_lon, city_name):
+    # Escolhe os pontos base dependendo da cidade; retorna (tipo, nome, lat, lon) em ordem de geração
+    if city_name == "João Pessoa, PB":
+        groups = [jp_traffic_locations, jp_tourist_locations, jp_flood_locations]
+    else:
+        # Se não for JP, usa os offsets genéricos a partir do centro da cidade selecionada
+        groups = [
+            [{"name": p["name"], "lat": city_lat + p["lat_offset"], "lon": city_lon + p["lon_offset"]} for p in offsets]
+            for offsets in (generic_traffic_offsets, generic_tourist_offsets, generic_flood_offsets)
+        ]
+    return [(type_idx, loc["name"], loc["lat"], loc["lon"]) for type_idx, group in enumerate(groups) for loc in group]
+
+
+def make_rng(seed, city_name, day=None):
+    # Gerador determinístico por (semente, cidade[, dia]), para que cidades diferentes não compartilhem
+    # o mesmo ruído; com o dia, cada partição diária é reproduzível independentemente do período pedido
+    entropy = [seed, zlib.crc32(city_name.encode("utf-8"))]
+    if day is not None:
+        entropy.append(int(np.datetime64(day, 'D').astype(np.int64)) + 2 ** 31) # Dias antes de 1970 ficam positivos
+    return np.random.default_rng(entropy)
+
+
+# --- Regras de intensidade (vetorizadas) ---
+# Equivalentes a get_traffic_intensity/get_tourist_intensity/get_flood_risk_intensity, aplicadas a arrays inteiros
+def traffic_base_intensity(hour, day_of_week):
+    weekday = day_of_week < 5 # Dias úteis (Seg-Sex)
+    peak = ((hour >= 7) & (hour <= 9)) | ((hour >= 17) & (hour <= 19)) # Horários de pico
+    lunch = (hour >= 12) & (hour <= 14) # Almoço
+    leisure = (hour >= 10) & (hour <= 18) # Maior fluxo de lazer no fim de semana
+    return np.select([weekday & peak, weekday & lunch, ~weekday & leisure], [0.9, 0.6, 0.4], default=0.2)
+
+
+def tourist_base_intensity(hour, day_of_week):
+    weekend = day_of_week >= 5
+    busy = (hour >= 9) & (hour <= 18) # Horário de maior movimento
+    some = (hour >= 10) & (hour <= 17) # Alguns turistas em dias úteis
+    return np.select([weekend & busy, ~weekend & some], [0.9, 0.4], default=0.1)
+
+
+def flood_base_intensity(hour, rain_forecast_mm):
+    rush = ((hour >= 6) & (hour <= 10)) | ((hour >= 16) & (hour <= 20))
+    return np.select(
+        [(rain_forecast_mm > 30) & rush, rain_forecast_mm > 15, rain_forecast_mm > 0],
+        [0.9, 0.6, 0.3],
+        default=0.1, # Base sem chuva
+    )
+
+
+# --- Geração de Dados Simulados Dinâmicos e Espalhados ---
+def generate_simulated_data(city_lat, city_lon, city_name, start_date_sim, end_date_sim, seed=DEFAULT_SEED, compact=False):
+    dates = np.arange(
+        np.datetime64(start_date_sim, 'D'),
+        np.datetime64(end_date_sim, 'D') + np.timedelta64(1, 'D'),
+        dtype='datetime64[D]',
+    )
+    return generate_simulated_days(city_lat, city_lon, city_name, dates, seed=seed, compact=compact)
+
+
+def generate_simulated_days(city_lat, city_lon, city_name, dates, seed=DEFAULT_SEED, compact=False):
+    # Gera apenas os dias pedidos (não precisam ser contíguos). Cada dia tem seu próprio gerador,
+    # então o mesmo dia sai idêntico seja gerado sozinho ou dentro de um período maior.
+    dates = np.unique(np.asarray(dates, dtype='datetime64[D]'))
+    locations = get_base_locations(city_lat, city_lon, city_name)
+
+    loc_type = np.array([loc[0] for loc in locations], dtype=np.int64)
+    loc_name = np.array([loc[1] for loc in locations], dtype=object)
+    loc_lat = np.array([loc[2] for loc in locations], dtype=np.float64)
+    loc_lon = np.array([loc[3] for loc in locations], dtype=np.float64)
+
+    # Grade dia x hora x local, achatada na mesma ordem do laço original (dia, hora, local)
+    n_days, n_locs = len(dates), len(locations)
+    grid_shape = (n_days, 24, n_locs)
+
+    # 1970-01-01 foi uma quinta-feira (weekday 3)
+    day_of_week = ((dates.astype(np.int64) + 3) % 7)[:, None]
+
+    # Sorteios por dia, na ordem do gerador: o primeiro escolhe a chuva (o mesmo que rng.choice
+    # com p faria) e os seguintes são o ruído e o jitter de lat/lon de cada hora x local. Cada
+    # variável tem seu bloco contíguo (dia, hora, local), então os sorteios são gravados direto
+    # nas linhas do dia, sem escrita espaçada, e o resto é calculado no próprio bloco
+    rain_draws = np.empty(n_days)
+    draws = np.empty((3, n_days, 24, n_locs))
+    for i, day in enumerate(dates):
+        rng = make_rng(seed, city_name, day)
+        rain_draws[i] = rng.random()
+        for values in draws[:, i]:
+            rng.random(out=values)
+    rain_cdf = np.cumsum(RAIN_PROBABILITIES)
+    rain_by_day = RAIN_LEVELS_MM[np.searchsorted(rain_cdf / rain_cdf[-1], rain_draws, side='right')]
+    hour = np.arange(24)[None, :]
+
+    # As regras só dependem de (dia, hora, tipo): calcula a grade pequena e expande por local
+    base_by_type = np.stack([
+        traffic_base_intensity(hour, day_of_week),
+        tourist_base_intensity(hour, day_of_week),
+        flood_base_intensity(hour, rain_by_day[:, None]),
+    ], axis=-1)
+
+    def expand(per_loc):
+        return np.broadcast_to(per_loc, grid_shape).ravel()
+
+    def expand_by_day(per_day):
+        return np.repeat(per_day, 24 * n_locs)
+
+    # Ruído de intensidade e jitter de posição: os termos por local entram pelo broadcast e as
+    # contas são feitas no bloco dos sorteios, sem arrays temporários
+    intensity, lat, lon = draws
+    intensity *= TYPE_NOISE[loc_type]
+    intensity += base_by_type[:, :, loc_type]
+    np.minimum(intensity, 1.0, out=intensity)
+    intensity *= 10
+    jitter = TYPE_JITTER[loc_type]
+    lat -= 0.5 # Variação muito pequena para manter perto do local base
+    lat *= jitter
+    lat += loc_lat
+    lon -= 0.5
+    lon *= jitter
+    lon += loc_lon
+    intensity, lat, lon = intensity.ravel(), lat.ravel(), lon.ravel()
+
+    timestamps = (
+        dates.astype('datetime64[ns]')[:, None]
+        + np.arange(24).astype('timedelta64[h]').astype('timedelta64[ns]')[None, :]
+    )
+    day_of_week = day_of_week.ravel()
+
+    if compact:
+        # Categóricos montados direto dos códigos, sem materializar as strings por linha
+        name_codes, name_categories = pd.factorize(loc_name)
+        return pd.DataFrame({
+            'lat': lat.astype(np.float32),
+            'lon': lon.astype(np.float32),
+            'intensity': intensity.astype(np.float32),
+            'type': pd.Categorical.from_codes(expand(loc_type), dtype=TYPE_DTYPE),
+            'location_name': pd.Categorical.from_codes(expand(name_codes), categories=name_categories),
+            'timestamp': np.repeat(timestamps.ravel(), n_locs),
+            'day_of_week': expand_by_day(day_of_week.astype(np.int8)),
+            'rain_forecast_mm': expand_by_day(rain_by_day.astype(np.int16)),
+        })
+
+    areas = np.array([type_areas[name] for name in type_names], dtype=object)
+    df = pd.DataFrame({
+        'lat': lat,
+        'lon': lon,
+        'intensity': intensity,
+        'type': expand(np.array(type_names, dtype=object)[loc_type]),
+        'location_name': expand(loc_name),
+        'area': expand(areas[loc_type]),
+        'timestamp': np.repeat(timestamps.ravel(), n_locs),
+        'day_of_week': expand_by_day(day_of_week),
+        'rain_forecast_mm': expand_by_day(rain_by_day),
+    })
+    df['day_of_week_name'] = expand_by_day(np.array(day_names, dtype=object)[day_of_week])
+    return df
+
+
+# --- Representação Compacta ---
+# Strings repetidas viram categóricos, numéricos usam o menor tipo que comporta os valores e
+# colunas deriváveis (area, day_of_week_name) saem da tabela e voltam via tabelas de consulta.
+def compact_event_table(df):
+    compact = pd.DataFrame({
+        'lat': df['lat'].astype(np.float32),
+        'lon': df['lon'].astype(np.float32),
+        'intensity': df['intensity'].astype(np.float32),
+        'type': df['type'].astype(TYPE_DTYPE),
+        'location_name': df['location_name'].astype('category'),
+        'timestamp': df['timestamp'],
+        'day_of_week': df['day_of_week'].astype(np.int8),
+        'rain_forecast_mm': df['rain_forecast_mm'].astype(np.int16),
+    })
+    return compact.reset_index(drop=True)
+
+
+def expand_event_table(df):
+    # Reconstrói as colunas derivadas a partir das tabelas de consulta (type_areas, day_names)
+    expanded = df.copy()
+    expanded['area'] = df['type'].map(type_areas).astype('category' if isinstance(df['type'].dtype, pd.CategoricalDtype) else object)
+    expanded['day_of_week_name'] = pd.Categorical.from_codes(df['day_of_week'].astype(np.int64), categories=day_names)
+    return expanded
+
+
+def memory_report(df, compact=None):
+    # Compara o consumo de memória (deep) por coluna entre a tabela original e a compacta
+    if compact is None:
+        compact = compact_event_table(df)
+    before = df.memory_usage(deep=True, index=False)
+    after = compact.memory_usage(deep=True, index=False).reindex(before.index, fill_value=0)
+    report = pd.DataFrame({
+        'original_bytes': before,
+        'compact_bytes': after,
+        'original_dtype': df.dtypes.astype(str),
+        'compact_dtype': compact.dtypes.astype(str).reindex(before.index, fill_value='(tabela de consulta)'),
+    })
+    report.loc['TOTAL', ['original_bytes', 'compact_bytes']] = [before.sum(), after.sum()]
+    report['ratio'] = report['compact_bytes'] / report['original_bytes']
+    return report
+
+
+if __name__ == "__main__":
+    import datetime
+
+    # Relatório de memória para um ano de dados simulados de João Pessoa
+    full = generate_simulated_data(-7.1197, -34.8450, "João Pessoa, PB", datetime.date(2025, 1, 1), datetime.date(2025, 12, 31))
+    with pd.option_context('display.width', 120):
+        print(memory_report(full))
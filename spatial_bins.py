@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+
+# --- Agregação Espacial e Nível de Detalhe ---
+# Abaixo de RAW_POINTS_MIN_ZOOM os pontos são agregados numa grade quadrada cujo lado equivale
+# a CELL_PIXELS pixels no zoom atual; o mapa recebe uma linha por (tipo, célula) com média,
+# pico e contagem, então o payload fica limitado pelo número de células, não de eventos.
+RAW_POINTS_MIN_ZOOM = 14
+CELL_PIXELS = 32
+
+METERS_PER_PIXEL_ZOOM_0 = 156543.03392 # Web Mercator, no equador
+METERS_PER_DEGREE = 111320.0
+
+
+def cell_size_meters(zoom, latitude, cell_pixels=CELL_PIXELS):
+    return cell_pixels * METERS_PER_PIXEL_ZOOM_0 * np.cos(np.radians(latitude)) / 2 ** zoom
+
+
+def use_raw_points(zoom, min_zoom=RAW_POINTS_MIN_ZOOM):
+    return zoom >= min_zoom
+
+
+def _hour_range_label(first_minute, last_minute):
+    first = f"{first_minute // 60:02d}:{first_minute % 60:02d}"
+    last = f"{last_minute // 60:02d}:{last_minute % 60:02d}"
+    return first if first == last else f"{first}–{last}"
+
+
+def aggregate_points(df, zoom, latitude, cell_pixels=CELL_PIXELS):
+    # Agrega os pontos de um tipo por célula; latitude fixa a grade (use o centro da cidade,
+    # para que todos os tipos caiam na mesma grade)
+    columns = ['lat', 'lon', 'intensity', 'intensity_max', 'count', 'type', 'location_name', 'hour_label', 'rain_forecast_mm']
+    if df.empty:
+        return pd.DataFrame(columns=columns)
+
+    lat_step = cell_size_meters(zoom, latitude, cell_pixels) / METERS_PER_DEGREE
+    lon_step = lat_step / np.cos(np.radians(latitude))
+    cell_x = np.floor(df['lon'].to_numpy(dtype=np.float64) / lon_step).astype(np.int64)
+    cell_y = np.floor(df['lat'].to_numpy(dtype=np.float64) / lat_step).astype(np.int64)
+    cell_ids, _ = pd.factorize(cell_x * (2 ** 32) + cell_y)
+
+    timestamps = df['timestamp']
+    points = pd.DataFrame({
+        'cell': cell_ids,
+        'lat': df['lat'].to_numpy(dtype=np.float64),
+        'lon': df['lon'].to_numpy(dtype=np.float64),
+        'intensity': df['intensity'].to_numpy(dtype=np.float64),
+        'minute': (timestamps.dt.hour * 60 + timestamps.dt.minute).to_numpy(),
+        'rain_forecast_mm': df['rain_forecast_mm'].to_numpy(),
+    })
+    cells = points.groupby('cell', sort=True).agg(
+        lat=('lat', 'mean'),
+        lon=('lon', 'mean'),
+        intensity=('intensity', 'mean'),
+        intensity_max=('intensity', 'max'),
+        count=('intensity', 'size'),
+        first_minute=('minute', 'min'),
+        last_minute=('minute', 'max'),
+        rain_forecast_mm=('rain_forecast_mm', 'max'),
+    )
+
+    # Local mais frequente de cada célula, com a quantidade de outros locais agregados junto
+    location_codes, location_names = pd.factorize(df['location_name'])
+    location_counts = pd.DataFrame({'cell': cell_ids, 'location': location_codes}).value_counts()
+    top_location = location_counts.reset_index().drop_duplicates('cell').set_index('cell')['location']
+    distinct_locations = location_counts.groupby(level='cell').size()
+    labels = [
+        str(location_names[code]) + ("" if n == 1 else f" (+{n - 1} {'local' if n == 2 else 'locais'})")
+        for code, n in zip(top_location.reindex(cells.index), distinct_locations.reindex(cells.index))
+    ]
+
+    return pd.DataFrame({
+        'lat': cells['lat'].to_numpy(),
+        'lon': cells['lon'].to_numpy(),
+        'intensity': cells['intensity'].to_numpy(),
+        'intensity_max': cells['intensity_max'].to_numpy(),
+        'count': cells['count'].to_numpy(),
+        'type': str(df['type'].iloc[0]), # Um único tipo por DataFrame
+        'location_name': labels,
+        'hour_label': [_hour_range_label(a, b) for a, b in zip(cells['first_minute'], cells['last_minute'])],
+        'rain_forecast_mm': cells['rain_forecast_mm'].to_numpy(),
+    }, columns=columns)
+
+
+def level_of_detail(typed_frames, zoom, latitude, min_zoom=RAW_POINTS_MIN_ZOOM, cell_pixels=CELL_PIXELS):
+    # Decide entre pontos brutos e células; retorna (frames por tipo, raio das colunas em metros ou None)
+    if use_raw_points(zoom, min_zoom):
+        return typed_frames, None
+    aggregated = {type_name: aggregate_points(df, zoom, latitude, cell_pixels) for type_name, df in typed_frames.items()}
+    return aggregated, cell_size_meters(zoom, latitude, cell_pixels) * 0.4
@@ -0,0 +1,107 @@
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# --- Tempo por Etapa ---
+# Mede cada etapa de um rerun (ou de um cenário do benchmark.py): tempo de parede, linhas
+# produzidas e memória. A variação do RSS na etapa (RSS atual no fim menos no início, lido de
+# /proc/self/statm) é barata e fica sempre ligada; é negativa quando a etapa libera memória.
+# O pico alocado dentro da etapa exige tracemalloc (track_memory=True), que deixa o código
+# medido mais lento e só deve ser usado para investigar memória.
+
+
+def current_rss_bytes():
+    # None fora do Linux (sem /proc)
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class StageRecord:
+    def __init__(self, name):
+        self.name = name
+        self.seconds = None
+        self.rows = None
+        self.peak_alloc_bytes = None
+        self.rss_delta_bytes = None
+        self.external = False # Medida fora do timer (não entra em total_seconds)
+
+    def as_dict(self):
+        return {
+            "stage": self.name,
+            "seconds": self.seconds,
+            "rows": self.rows,
+            "peak_alloc_bytes": self.peak_alloc_bytes,
+            "rss_delta_bytes": self.rss_delta_bytes,
+            "external": self.external,
+        }
+
+
+class StageTimer:
+    def __init__(self, track_memory=False):
+        self.track_memory = track_memory
+        self.records = []
+        self.started_at = time.time()
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        # with timer.stage("filtro") as stage: ...; stage.rows = len(df)
+        record = StageRecord(name)
+        record.rows = rows
+        tracing = self.track_memory and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        elif self.track_memory:
+            tracemalloc.reset_peak()
+        rss_before = current_rss_bytes()
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record.seconds = time.perf_counter() - start
+            if self.track_memory:
+                record.peak_alloc_bytes = tracemalloc.get_traced_memory()[1]
+            if tracing:
+                tracemalloc.stop()
+            rss_after = current_rss_bytes()
+            if rss_before is not None and rss_after is not None:
+                record.rss_delta_bytes = rss_after - rss_before
+            self.records.append(record)
+
+    def record(self, name, seconds, rows=None):
+        # Etapas medidas fora do timer (ex.: a chamada ao modelo na thread do InsightWorker)
+        record = StageRecord(name)
+        record.seconds, record.rows = seconds, rows
+        record.external = True
+        self.records.append(record)
+        return record
+
+    @property
+    def total_seconds(self):
+        return sum(record.seconds for record in self.records if record.seconds is not None and not record.external)
+
+    def seconds_by_stage(self):
+        # Soma por nome, para etapas repetidas num mesmo rerun
+        totals = {}
+        for record in self.records:
+            totals[record.name] = totals.get(record.name, 0.0) + (record.seconds or 0.0)
+        return totals
+
+    def as_dict(self):
+        return {
+            "started_at": self.started_at,
+            "total_seconds": self.total_seconds,
+            "stages": [record.as_dict() for record in self.records],
+        }
+
+    def to_json(self, indent=2):
+        return json.dumps(self.as_dict(), indent=indent, ensure_ascii=False)
+
+    def to_frame(self):
+        import pandas as pd
+
+        return pd.DataFrame([record.as_dict() for record in self.records], columns=list(StageRecord("").as_dict()))
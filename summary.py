@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+
+from event_index import HOURS_PER_DAY, concat_frames
+from simulation import TYPE_DTYPE, type_names
+
+# --- Resumo Estatístico das Ocorrências ---
+# Uma única agregação por (tipo, local, hora) com soma, contagem e máximo da intensidade;
+# as visões por tipo, por hora e por local saem dessa grade pequena, sem voltar às linhas.
+# Só os percentis precisam de um segundo passe (um sort por tipo e intensidade). Alimenta o
+# prompt dos insights, o painel de estatísticas do app e os jobs em lote.
+DEFAULT_PERCENTILES = (0.5, 0.9)
+DEFAULT_TOP_N = 3
+
+
+class EventSummary:
+    def __init__(self, by_type, by_hour, by_location):
+        # by_type: índice tipo; count, mean, max, p50..., n_locations, peak_hour, peak_hour_mean
+        # by_hour: índice (tipo, hora); count, mean, max
+        # by_location: índice (tipo, local); count, mean, max
+        self.by_type = by_type
+        self.by_hour = by_hour
+        self.by_location = by_location
+
+    @property
+    def types(self):
+        return list(self.by_type.index)
+
+    def locations(self, type_name):
+        # Locais do tipo na ordem em que aparecem nos dados
+        return list(self.by_location.loc[type_name].index) if type_name in self.by_type.index else []
+
+    def top_locations(self, type_name, n=DEFAULT_TOP_N):
+        if type_name not in self.by_type.index:
+            return self.by_location.iloc[:0].droplevel('type')
+        return self.by_location.loc[type_name].nlargest(n, 'mean')
+
+
+def _percentile_column(q):
+    return f"p{round(q * 100):g}"
+
+
+def percentile_columns(summary):
+    return [column for column in summary.by_type.columns if column[0] == "p" and column[1:].isdigit()]
+
+
+def summarize_events(df, percentiles=DEFAULT_PERCENTILES):
+    # df: ocorrências de qualquer tamanho (fatias do índice ou o ano inteiro), compacto ou não
+    percentile_columns = [_percentile_column(q) for q in percentiles]
+    if df.empty:
+        by_type = pd.DataFrame(columns=['count', 'mean', 'max', *percentile_columns, 'n_locations', 'peak_hour', 'peak_hour_mean'])
+        by_hour = pd.DataFrame(columns=['count', 'mean', 'max'], index=pd.MultiIndex.from_arrays([[], []], names=['type', 'hour']))
+        by_location = pd.DataFrame(columns=['count', 'mean', 'max'], index=pd.MultiIndex.from_arrays([[], []], names=['type', 'location']))
+        return EventSummary(by_type.rename_axis('type'), by_hour, by_location)
+
+    type_codes = np.asarray(df['type'].astype(TYPE_DTYPE).cat.codes, dtype=np.int64)
+    location_codes, location_names = pd.factorize(df['location_name'])
+    hours = df['timestamp'].dt.hour.to_numpy(dtype=np.int64)
+    intensity = df['intensity'].to_numpy(dtype=np.float64)
+
+    # Grade (tipo, local, hora) preenchida num passe só: soma, contagem e máximo por célula
+    shape = (len(type_names), len(location_names), HOURS_PER_DAY)
+    cell = (type_codes * shape[1] + location_codes) * HOURS_PER_DAY + hours
+    sums = np.bincount(cell, weights=intensity, minlength=np.prod(shape)).reshape(shape)
+    counts = np.bincount(cell, minlength=np.prod(shape)).reshape(shape)
+    maxes = np.full(np.prod(shape), -np.inf)
+    np.maximum.at(maxes, cell, intensity)
+    maxes = maxes.reshape(shape)
+
+    type_labels = np.asarray(type_names, dtype=object)
+    location_labels = np.asarray(location_names, dtype=object)
+
+    def rollup(axis, index_names, labels):
+        total, count, peak = sums.sum(axis=axis), counts.sum(axis=axis), maxes.max(axis=axis)
+        observed = np.nonzero(count)
+        index = pd.MultiIndex.from_arrays([lab[pos] for lab, pos in zip(labels, observed)], names=index_names)
+        return pd.DataFrame({'count': count[observed], 'mean': total[observed] / count[observed], 'max': peak[observed]}, index=index)
+
+    by_hour = rollup(1, ['type', 'hour'], [type_labels, np.arange(HOURS_PER_DAY)])
+    by_location = rollup(2, ['type', 'location'], [type_labels, location_labels])
+
+    type_count = counts.sum(axis=(1, 2))
+    observed_types = np.nonzero(type_count)[0]
+    by_type = pd.DataFrame({
+        'count': type_count[observed_types],
+        'mean': sums.sum(axis=(1, 2))[observed_types] / type_count[observed_types],
+        'max': maxes.max(axis=(1, 2))[observed_types],
+    }, index=pd.Index(type_labels[observed_types], name='type'))
+
+    # Percentis: um sort por (tipo, intensidade) e quantis sobre as fatias de cada tipo
+    sorted_intensity = intensity[np.lexsort((intensity, type_codes))]
+    bounds = np.concatenate([[0], np.cumsum(type_count)])
+    for q, column in zip(percentiles, percentile_columns):
+        by_type[column] = [np.quantile(sorted_intensity[bounds[t]:bounds[t + 1]], q) for t in observed_types]
+
+    hourly_mean = np.divide(sums.sum(axis=1), counts.sum(axis=1), out=np.full(shape[::2], -np.inf), where=counts.sum(axis=1) > 0)
+    by_type['n_locations'] = (counts.sum(axis=2) > 0).sum(axis=1)[observed_types]
+    by_type['peak_hour'] = hourly_mean.argmax(axis=1)[observed_types]
+    by_type['peak_hour_mean'] = hourly_mean.max(axis=1)[observed_types]
+    return EventSummary(by_type, by_hour, by_location)
+
+
+def summarize_typed(typed_frames, percentiles=DEFAULT_PERCENTILES):
+    # Mesmo resumo a partir das fatias {tipo: DataFrame} de EventIndex.query_typed
+    frames = [df for df in typed_frames.values() if not df.empty]
+    if not frames:
+        return summarize_events(pd.DataFrame(), percentiles)
+    return summarize_events(frames[0] if len(frames) == 1 else concat_frames(frames), percentiles)
+
@@ -0,0 +1,57 @@
+import json
+import os
+
+from dataset_store import DayFileWriter
+from ingestion import READ_BLOCK_BYTES, ingest, open_source, write_sample_feed
+from simulation import type_names
+
+
+SAMPLE_ROWS = 60_000 # Mais de um bloco de leitura (READ_BLOCK_BYTES) em CSV e em JSONL
+
+
+def test_csv_bad_rows_after_first_block_are_rejected(tmp_path):
+    path = write_sample_feed(str(tmp_path / "feed.csv"), SAMPLE_ROWS)
+    assert os.path.getsize(path) > READ_BLOCK_BYTES
+    _, before = ingest(open_source(path))
+
+    with open(path, "a", encoding="utf-8") as file:
+        file.write("not-a-time,-7.12,-34.85,traffic,5.0,Sensor,0\n")
+        file.write("2025-06-03T10:00:00,-7.12,-34.85,traffic,n/a-ish,Sensor,0\n")
+        file.write("2025-06-03T10:00:00Z,-7.12,-34.85,traffic,5.0,Sensor,0\n")
+    _, stats = ingest(open_source(path))
+
+    assert stats.rows_rejected == before.rows_rejected + 2
+    assert stats.rows_ingested == before.rows_ingested + 1
+
+
+def test_jsonl_values_of_another_type_after_first_block(tmp_path):
+    path = write_sample_feed(str(tmp_path / "feed.jsonl"), SAMPLE_ROWS)
+    assert os.path.getsize(path) > READ_BLOCK_BYTES
+    _, before = ingest(open_source(path))
+
+    event = {"ts": "2025-06-03T10:00:00", "latitude": -7.12, "longitude": -34.85, "event_type": "traffic", "value": 5.0, "sensor": "Sensor", "rain_mm": 0}
+    with open(path, "a", encoding="utf-8") as file:
+        file.write(json.dumps({**event, "value": "n/a"}) + "\n")
+        file.write(json.dumps({**event, "value": "7.5", "sensor": 17}) + "\n")
+        file.write("{não é json\n")
+    _, stats = ingest(open_source(path))
+
+    assert stats.rows_rejected == before.rows_rejected + 2
+    assert stats.rows_ingested == before.rows_ingested + 1
+
+
+def test_day_file_writer_matches_in_memory_index(tmp_path):
+    path = write_sample_feed(str(tmp_path / "feed.csv"), 20_000)
+    index, _ = ingest(open_source(path))
+    # Flushes pequenos: os dias da fronteira entre flushes são regravados várias vezes
+    writer, stats = ingest(open_source(path, chunk_rows=3_000), DayFileWriter(str(tmp_path / "store")), flush_rows=5_000)
+
+    dataset = writer.dataset
+    assert dataset.dates == index.dates
+    assert len(dataset) == len(index) == stats.rows_ingested
+    for date in index.dates:
+        assert dataset.rain_forecast(date) == index.rain_forecast(date)
+        expected = index.query_typed(date, (7, 9), type_names)
+        for type_name, rows in dataset.query_typed(date, (7, 9), type_names).items():
+            key = ['timestamp', 'lat', 'lon']
+            assert rows.sort_values(key)[key].values.tolist() == expected[type_name].sort_values(key)[key].values.tolist()
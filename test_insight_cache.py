@@ -0,0 +1,75 @@
+import threading
+import time
+
+import pytest
+
+from insight_cache import InsightCache
+from insight_worker import DONE, InsightWorker
+from llm_backends import StubModel
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "insights.sqlite3")
+
+
+def test_entries_expire_after_ttl(cache_path):
+    cache = InsightCache(cache_path, ttl_seconds=0.2)
+    cache.put("chave", "resposta")
+    assert cache.get("chave") == "resposta"
+    time.sleep(0.3)
+    assert cache.get("chave") is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted(cache_path):
+    cache = InsightCache(cache_path, max_entries=2)
+    cache.put("a", "resposta a")
+    time.sleep(0.01)
+    cache.put("b", "resposta b")
+    time.sleep(0.01)
+    assert cache.get("a") == "resposta a" # "a" passa a ser a mais recente
+    time.sleep(0.01)
+    cache.put("c", "resposta c")
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == "resposta a"
+    assert cache.get("c") == "resposta c"
+
+
+def test_concurrent_requests_share_one_model_call(cache_path):
+    model = StubModel(latency_seconds=0.2)
+    cache = InsightCache(cache_path)
+    worker = InsightWorker(model, cache=cache)
+    barrier = threading.Barrier(8)
+    jobs = []
+
+    def request():
+        barrier.wait()
+        jobs.append(worker.submit("chave", "Cidade: Teste"))
+
+    try:
+        threads = [threading.Thread(target=request) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for job in jobs:
+            assert job.wait(timeout=5)
+    finally:
+        worker.shutdown()
+
+    assert model.calls == 1
+    assert len({id(job) for job in jobs}) == 1
+    assert jobs[0].status == DONE
+    assert cache.get("chave") == jobs[0].text
+
+    # Um novo worker (outro processo do app, por exemplo) lê a resposta do cache sem chamar o modelo
+    other = InsightWorker(model, cache=cache)
+    try:
+        job = other.submit("chave", "Cidade: Teste")
+    finally:
+        other.shutdown()
+    assert job.source == "cache"
+    assert model.calls == 1
+
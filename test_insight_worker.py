@@ -0,0 +1,125 @@
+import threading
+import time
+
+import pytest
+
+from insight_cache import InsightCache
+from insight_worker import CANCELLED, DONE, FAILED, InsightWorker
+from llm_backends import StubModel
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "insights.sqlite3")
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condição não atingida a tempo"
+        time.sleep(0.005)
+
+
+def test_partial_text_is_visible_while_streaming():
+    model = StubModel(chunk_delay_seconds=0.02)
+    worker = InsightWorker(model)
+    try:
+        job = worker.submit("chave", "Cidade: Teste")
+        wait_until(lambda: job.text)
+        partial = job.text
+        assert not job.finished
+        wait_until(lambda: len(job.text) > len(partial) or job.finished)
+        assert job.wait(timeout=5)
+    finally:
+        worker.shutdown()
+    assert job.status == DONE
+    assert job.text.startswith(partial)
+    assert len(job.text) > len(partial)
+    assert job.text == model._reply_for("Cidade: Teste")
+
+
+def test_release_by_last_subscriber_cancels_without_caching(cache_path):
+    cache = InsightCache(cache_path)
+    worker = InsightWorker(StubModel(chunk_delay_seconds=0.05), cache=cache)
+    try:
+        job = worker.submit("chave", "Cidade: Teste", subscriber="sessão a")
+        assert worker.submit("chave", "Cidade: Teste", subscriber="sessão b") is job
+        wait_until(lambda: job.text)
+        worker.release("chave", "sessão a")
+        assert not job.cancelled # Ainda há uma sessão interessada
+        worker.release("chave", "sessão b")
+        assert job.wait(timeout=5)
+    finally:
+        worker.shutdown()
+    assert job.status == CANCELLED
+    assert cache.get("chave") is None
+    assert len(cache) == 0
+
+
+def test_failed_call_is_retried_with_backoff():
+    model = StubModel(failures=1)
+    worker = InsightWorker(model, backoff_seconds=0.05)
+    try:
+        start = time.monotonic()
+        job = worker.submit("chave", "Cidade: Teste")
+        assert job.wait(timeout=5)
+        elapsed = time.monotonic() - start
+    finally:
+        worker.shutdown()
+    assert job.status == DONE
+    assert job.attempts == 2
+    assert model.calls == 2
+    assert elapsed >= 0.05
+    assert job.text == model._reply_for("Cidade: Teste")
+
+
+def test_done_job_is_regenerated_after_ttl(cache_path):
+    model = StubModel()
+    worker = InsightWorker(model, cache=InsightCache(cache_path, ttl_seconds=0.2))
+    try:
+        first = worker.submit("chave", "Cidade: Teste")
+        assert first.wait(timeout=5)
+        assert worker.submit("chave", "Cidade: Teste") is first
+        time.sleep(0.3)
+        second = worker.submit("chave", "Cidade: Teste")
+        assert second is not first
+        assert second.wait(timeout=5)
+    finally:
+        worker.shutdown()
+    assert second.status == DONE
+    assert model.calls == 2
+
+
+class SilentModel:
+    # Modelo que nunca envia um trecho e ignora o timeout da requisição
+    def __init__(self):
+        self.release = threading.Event()
+
+    def generate_content(self, prompt_text, stream=False, request_options=None):
+        self.release.wait()
+        return iter(())
+
+
+def test_timeout_applies_without_any_chunk():
+    model = SilentModel()
+    worker = InsightWorker(model, timeout_seconds=0.3, max_retries=0)
+    try:
+        start = time.monotonic()
+        job = worker.submit("chave", "Cidade: Teste")
+        assert job.wait(timeout=5)
+        assert time.monotonic() - start < 2
+    finally:
+        model.release.set()
+        worker.shutdown()
+    assert job.status == FAILED
+    assert isinstance(job.error, TimeoutError)
+
+
+def test_stub_model_honours_request_timeout():
+    model = StubModel(latency_seconds=5)
+    start = time.monotonic()
+    with pytest.raises(TimeoutError):
+        model.generate_content("Cidade: Teste", request_options={"timeout": 0.1})
+    with pytest.raises(TimeoutError):
+        list(model.generate_content("Cidade: Teste", stream=True, request_options={"timeout": 0.1}))
+    assert time.monotonic() - start < 1